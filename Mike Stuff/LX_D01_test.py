@@ -1,9 +1,16 @@
 import asyncio
+import logging
+import os
+import struct
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from bleak import BleakClient, BleakScanner
 
+# Per-packet hex traces are DEBUG; run with LX_LOG_LEVEL=DEBUG to capture them
+logging.basicConfig(level=os.environ.get("LX_LOG_LEVEL", "INFO"), format="%(message)s")
+logger = logging.getLogger(__name__)
+
 # Connection config (match lx_motor_test.py)
 PRINTER_ADDRESS = "AA:BB:CC:DD:EE:FF"  # set to MAC; leave placeholder to auto-scan by name
 PRINTER_NAME = "LX-D01"
@@ -14,6 +21,8 @@ NOTIFY_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"  # Notify
 
 # 20-byte ATT payload (MTU 23) → 4 bytes header + 16 bytes data
 PAYLOAD_DATA_LEN = 16
+BLOCK_LEN = 4 + PAYLOAD_DATA_LEN
+ATT_WRITE_OVERHEAD = 3  # opcode + handle
 MAX_IN_FLIGHT_WRITES = 2  # observed controller credits in log
 
 
@@ -22,56 +31,81 @@ class JobState:
     block_count: int
     job_id: int
     complete_event: asyncio.Event
+    ready_event: asyncio.Event
+    credits: asyncio.Semaphore
     completion_seen: bool = False
     ack_required: bool = True
 
 
-def le16(value: int) -> bytes:
-    return value.to_bytes(2, "little")
+SA_FRAME = struct.Struct("<BBHHHHH")
+DATA_BLOCK = struct.Struct(f"<BBH{PAYLOAD_DATA_LEN}s")
+BLOCK_HEADER = struct.Struct("<BBH")
 
 
 def build_sa(op: int, w1: int, w2: int, w3: int = 0, w4: int = 0, w5: int = 0) -> bytes:
     # SA (5A) control frame: op + five 16-bit words
-    return bytes([0x5A, op]) + le16(w1) + le16(w2) + le16(w3) + le16(w4) + le16(w5)
+    return SA_FRAME.pack(0x5A, op, w1, w2, w3, w4, w5)
 
 
 def build_data_block(index: int, payload16: bytes) -> bytes:
     if len(payload16) != PAYLOAD_DATA_LEN:
         raise ValueError(f"payload must be {PAYLOAD_DATA_LEN} bytes; got {len(payload16)}")
-    return bytes([0x55, 0x00]) + le16(index) + payload16
+    return DATA_BLOCK.pack(0x55, 0x00, index, payload16)
+
+
+def chunk_image(image_bytes: bytes) -> bytes:
+    # All data blocks back to back in one buffer; the zero-initialised tail
+    # doubles as padding for the last block.
+    n_blocks = (len(image_bytes) + PAYLOAD_DATA_LEN - 1) // PAYLOAD_DATA_LEN
+    out = bytearray(n_blocks * BLOCK_LEN)
+    src = memoryview(image_bytes)
+    for i in range(n_blocks):
+        pos = i * BLOCK_LEN
+        BLOCK_HEADER.pack_into(out, pos, 0x55, 0x00, i)
+        chunk = src[i * PAYLOAD_DATA_LEN : (i + 1) * PAYLOAD_DATA_LEN]
+        out[pos + BLOCK_HEADER.size : pos + BLOCK_HEADER.size + len(chunk)] = chunk
+    return bytes(out)
 
 
-def chunk_image(image_bytes: bytes) -> List[bytes]:
-    padded = image_bytes + b"\x00" * ((PAYLOAD_DATA_LEN - (len(image_bytes) % PAYLOAD_DATA_LEN)) % PAYLOAD_DATA_LEN)
-    blocks = []
-    for i in range(0, len(padded), PAYLOAD_DATA_LEN):
-        idx = i // PAYLOAD_DATA_LEN
-        blocks.append(build_data_block(idx, padded[i : i + PAYLOAD_DATA_LEN]))
-    return blocks
+def pack_frames(stream: bytes, mtu_size: int) -> List[memoryview]:
+    # Whole 20-byte blocks per ATT write; each keeps its own 55 header so the
+    # firmware parser sees the same stream as with MTU 23.
+    frame_len = max(1, (mtu_size - ATT_WRITE_OVERHEAD) // BLOCK_LEN) * BLOCK_LEN
+    view = memoryview(stream)
+    return [view[i : i + frame_len] for i in range(0, len(stream), frame_len)]
 
 
-def parse_notify(data: bytes) -> Optional[tuple[int, List[int]]]:
+def parse_notify(data: bytes) -> Optional[tuple[int, Tuple[int, ...]]]:
     if not data or data[0] != 0x5A:
         return None
     op = data[1]
-    # remaining words are little-endian 16-bit
-    words = [int.from_bytes(data[i : i + 2], "little") for i in range(2, len(data), 2)]
+    # remaining words are little-endian 16-bit; a trailing odd byte is a short word
+    words = struct.unpack_from(f"<{(len(data) - 2) // 2}H", data, 2)
+    if len(data) % 2:
+        words += (data[-1],)
     return op, words
 
 
 async def send_wwr(client: BleakClient, payload: bytes):
-    print(f"WRITE -> {payload.hex(' ')}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("WRITE -> %s", payload.hex(" "))
     await client.write_gatt_char(WRITE_UUID, payload, response=False)
 
 
-async def notify_handler(state: JobState, data: bytearray):
-    print(f"NOTIFY <- {bytes(data).hex(' ')}")
+def notify_handler(state: JobState, data: bytearray) -> None:
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("NOTIFY <- %s", data.hex(" "))
     parsed = parse_notify(bytes(data))
     if not parsed:
-        print("   (ignored: not 0x5A)")
+        if debug:
+            logger.debug("   (ignored: not 0x5A)")
         return
     op, words = parsed
-    print(f"   op=0x{op:02X} words={words}")
+    if debug:
+        logger.debug("   op=0x%02X words=%s", op, words)
+    if op == 0x02:
+        state.ready_event.set()
     if op == 0x06 and len(words) >= 2:
         state.completion_seen = True
         state.complete_event.set()
@@ -85,50 +119,62 @@ async def main():
         print(f"Searching by address {PRINTER_ADDRESS} ...")
         device = await BleakScanner.find_device_by_address(PRINTER_ADDRESS, timeout=10.0)
     if device is None:
-        devices = await BleakScanner.discover(timeout=10.0)
-        print(f"Discovered {len(devices)} devices")
-        for d in devices:
-            if d.name and PRINTER_NAME in d.name:
-                device = d
-                break
+        print(f"Searching by name {PRINTER_NAME} ...")
+        # Returns as soon as a matching advertisement arrives instead of
+        # always scanning for the full timeout
+        device = await BleakScanner.find_device_by_filter(
+            lambda d, _adv: bool(d.name and PRINTER_NAME in d.name), timeout=10.0)
     if device is None:
         raise SystemExit("Printer not found; set PRINTER_ADDRESS or ensure the device advertises name LX-D01")
     print(f"Using device: {device}")
 
     # Example image payload (replace with real raster data)
     sample_image = b"\xFF\x00" * 200  # 400 bytes → 25 blocks of 16 bytes
-    blocks = chunk_image(sample_image)
-    block_count = len(blocks)
+    stream = chunk_image(sample_image)
+    block_count = len(stream) // BLOCK_LEN
     print(f"Prepared {block_count} blocks")
 
-    state = JobState(block_count=block_count, job_id=1, complete_event=asyncio.Event())
+    state = JobState(
+        block_count=block_count,
+        job_id=1,
+        complete_event=asyncio.Event(),
+        ready_event=asyncio.Event(),
+        credits=asyncio.Semaphore(MAX_IN_FLIGHT_WRITES),
+    )
 
     async with BleakClient(device) as client:
         print("Connecting...")
         if not client.is_connected:
             raise SystemExit("Failed to connect")
+        frames = pack_frames(stream, client.mtu_size)
+        print(f"MTU {client.mtu_size}: {len(frames)} writes for {block_count} blocks")
         print("Connected, enabling notify")
-        await client.start_notify(NOTIFY_UUID, lambda _, data: asyncio.create_task(notify_handler(state, data)))
+        await client.start_notify(NOTIFY_UUID, lambda _, data: notify_handler(state, data))
 
-        # Optional: wait a moment for initial 5A02 status
-        await asyncio.sleep(0.2)
+        # Optional: wait for initial 5A02 status, but don't block the job on it
+        try:
+            await asyncio.wait_for(state.ready_event.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            print("No 5A02 status seen, starting job anyway")
 
         # Send start job (5A04) with block_count and job_id
         print(f"Sending start frame for job {state.job_id} with {block_count} blocks")
         start_frame = build_sa(op=0x04, w1=block_count, w2=state.job_id)
         await send_wwr(client, start_frame)
 
-        # Stream data with a small in-flight window
-        in_flight = 0
-        for pkt in blocks:
-            while in_flight >= MAX_IN_FLIGHT_WRITES:
-                await asyncio.sleep(0.005)
-                # Bleak does not expose credits directly; pacing via sleep
-            await send_wwr(client, pkt)
-            in_flight += 1
-            # crude pacing: assume controller returns credits quickly
-            await asyncio.sleep(0.001)
-            in_flight = max(0, in_flight - 1)
+        # Stream data with a small in-flight window. The printer sends no per-block
+        # ack, so a credit comes back as soon as bleak hands the write to the controller.
+        # A failed write cancels the rest of the stream and is raised from the group.
+        async def send_with_credit(pkt: bytes) -> None:
+            try:
+                await send_wwr(client, pkt)
+            finally:
+                state.credits.release()
+
+        async with asyncio.TaskGroup() as tg:
+            for pkt in frames:
+                await state.credits.acquire()
+                tg.create_task(send_with_credit(pkt))
 
         print("Waiting for completion notify (5A06)...")
         # Wait for completion notify (5A06)
@@ -148,4 +194,10 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop is optional (not available on Windows); fall back to the stock loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
@@ -16,7 +16,8 @@ Sequence:
 """
 
 import asyncio
-from typing import Optional, Callable, List
+import struct
+from typing import Dict, Optional
 from bleak import BleakClient, BleakScanner
 
 # ---------------------------------------------------------------------------
@@ -27,6 +28,9 @@ SERVICE_UUID = "0000FFE6-0000-1000-8000-00805f9b34fb"
 WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 
+# Command header: 5A, cmd byte, little-endian payload length
+CMD_HEADER = struct.Struct('<BBH')
+
 # ---------------------------------------------------------------------------
 # DRIVER
 # ---------------------------------------------------------------------------
@@ -36,7 +40,7 @@ class LXD01MotorTest:
         self.mac_address = mac_address
         self.device_name = device_name
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        self._ack_waiters: Dict[int, asyncio.Future] = {}
 
     async def connect(self, timeout: float = 20.0) -> None:
         if self.client and self.client.is_connected: return
@@ -45,11 +49,10 @@ class LXD01MotorTest:
         if self.mac_address:
             device = await BleakScanner.find_device_by_address(self.mac_address, timeout=timeout)
         else:
-            devices = await BleakScanner.discover(timeout=timeout)
-            for d in devices:
-                if d.name and self.device_name in d.name:
-                    device = d
-                    break
+            # Returns as soon as a matching advertisement arrives instead of
+            # always scanning for the full timeout
+            device = await BleakScanner.find_device_by_filter(
+                lambda d, _adv: bool(d.name and self.device_name in d.name), timeout=timeout)
         
         if not device: raise RuntimeError(f"{self.device_name} not found")
         
@@ -65,11 +68,10 @@ class LXD01MotorTest:
             self.client = None
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
-    
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+        # ACKs echo [5A] [Cmd]; wake whoever is waiting on that command byte
+        if len(data) >= 2 and data[0] == 0x5A:
+            ack = self._ack_waiters.pop(data[1], None)
+            if ack and not ack.done(): ack.set_result(bytes(data))
 
     async def _write(self, data: bytes) -> None:
         if not self.client or not self.client.is_connected: return
@@ -78,30 +80,25 @@ class LXD01MotorTest:
     async def send_command(self, name: str, cmd_byte: int, payload: bytes, wait_ack: bool = True) -> bool:
         print(f"👉 SENDING: {name} (0x{cmd_byte:02X})")
         
-        length = len(payload)
-        pkt = bytes([0x5A, cmd_byte, length & 0xFF, (length >> 8) & 0xFF]) + payload
+        # [5A] [Cmd] [LenL] [LenH] [Payload]
+        pkt = CMD_HEADER.pack(0x5A, cmd_byte, len(payload)) + payload
         
-        ack_event = asyncio.Event()
-        
-        def listener(data):
-            if len(data) >= 2 and data[0] == 0x5A and data[1] == cmd_byte:
-                ack_event.set()
-
         if wait_ack:
-            self.add_notify_callback(listener)
+            ack = asyncio.get_running_loop().create_future()
+            self._ack_waiters[cmd_byte] = ack
         
         await self._write(pkt)
         
         if wait_ack:
             try:
-                await asyncio.wait_for(ack_event.wait(), timeout=1.5)
+                await asyncio.wait_for(ack, timeout=1.5)
                 print(f"   ✅ ACK Received")
                 return True
             except asyncio.TimeoutError:
                 print(f"   ❌ NO ACK (Timeout)")
                 return False
             finally:
-                self.remove_notify_callback(listener)
+                if self._ack_waiters.get(cmd_byte) is ack: del self._ack_waiters[cmd_byte]
         return True
 
 async def main():
@@ -114,11 +111,9 @@ async def main():
     # ---------------------------------------------------------
     print("\n--- INITIALIZATION ---")
     await motor.send_command("Init", 0x01, b'')
-    await asyncio.sleep(0.2)
 
     # Latch/Enable: 0x06 is often "Wake" or "Latch buffer"
-    await motor.send_command("Latch/Enable", 0x06, b'\x00') 
-    await asyncio.sleep(0.2)
+    await motor.send_command("Latch/Enable", 0x06, b'\x00')
 
     # ---------------------------------------------------------
     # 2. CONFIGURATION SEQUENCE
@@ -128,15 +123,12 @@ async def main():
     # Set Spacing (0xA7): 0x20 = 32 dots (Standard line height)
     # If this is 0, motor might think "Move 0 distance".
     await motor.send_command("Set Line Spacing", 0xA7, b'\x20\x00')
-    await asyncio.sleep(0.1)
 
     # Set Energy (0xAF): Max (0xFFFF)
     await motor.send_command("Set Energy", 0xAF, b'\xFF\xFF')
-    await asyncio.sleep(0.1)
 
     # Set Speed (0xA4): Medium (0x0200)
     await motor.send_command("Set Speed", 0xA4, b'\x02\x00')
-    await asyncio.sleep(0.1)
 
     # ---------------------------------------------------------
     # 3. MOVEMENT SEQUENCE
@@ -147,7 +139,6 @@ async def main():
     # 0x64 = 100 steps
     print("\n[Attempt 1] 0xA9 Direct Feed...")
     await motor.send_command("Queue Feed (0xA9)", 0xA9, b'\x64\x00')
-    await asyncio.sleep(0.1)
     
     # Try Executing it immediately
     await motor.send_command("Execute (0x0E)", 0x0E, b'', wait_ack=False)
@@ -161,7 +152,6 @@ async def main():
     # 384 = 0x0180, 100 = 0x0064
     payload_a1 = b'\x80\x01\x64\x00\x00\x00'
     await motor.send_command("Start Job (0xA1)", 0xA1, payload_a1)
-    await asyncio.sleep(0.1)
     await motor.send_command("Execute (0x0E)", 0x0E, b'', wait_ack=False)
 
     await asyncio.sleep(2.0)
@@ -170,4 +160,10 @@ async def main():
     print("\nTest Complete.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop is optional (not available on Windows); fall back to the stock loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
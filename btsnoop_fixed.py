@@ -10,6 +10,7 @@ import base64
 import struct
 import sys
 import zlib
+from array import array
 
 # Enumeration of the values the 'type' field can take in a btsnooz
 # header. These values come from the Bluetooth stack's internal
@@ -21,6 +22,16 @@ TYPE_OUT_CMD = 0x20
 TYPE_OUT_ACL = 0x21
 TYPE_OUT_SCO = 0x22
 
+# btsnooz record headers (v1, v2) and the btsnoop record header we emit,
+# followed by the HCI packet type byte.
+SNOOZ_V1_HEADER = struct.Struct('=HIb')
+SNOOZ_V2_HEADER = struct.Struct('=HHIb')
+BTSNOOP_RECORD = struct.Struct('>IIIIIIB')
+
+# Inflate the btsnooz body, and flush btsnoop output, this many bytes at a time.
+SNOOZ_CHUNK_SIZE = 64 * 1024
+OUTPUT_FLUSH_SIZE = 64 * 1024
+
 def type_to_direction(pkt_type):
     """
     Returns the inbound/outbound direction of a packet given its type.
@@ -45,6 +56,67 @@ def type_to_hci(pkt_type):
         return b'\x04'
     return b'\x00'
 
+def inflate_snooz(compressed):
+    """
+    Yields the btsnooz body in chunks of at most SNOOZ_CHUNK_SIZE inflated
+    bytes instead of decompressing it all at once.
+    """
+    decompressor = zlib.decompressobj()
+    data = compressed
+    while True:
+        chunk = decompressor.decompress(data, SNOOZ_CHUNK_SIZE)
+        data = decompressor.unconsumed_tail
+        if chunk:
+            yield chunk
+        elif decompressor.eof or not data:
+            break
+    if not decompressor.eof:
+        raise zlib.error('Truncated btsnooz stream')
+
+def iter_snooz_records(compressed, header):
+    """
+    Yields (header fields, payload) for each btsnooz record.
+    """
+    pending = b''
+    for chunk in inflate_snooz(compressed):
+        pending = pending + chunk
+        mv = memoryview(pending)
+        offset = 0
+        while offset + header.size <= len(mv):
+            fields = header.unpack_from(mv, offset)
+            end = offset + header.size + fields[0] - 1
+            if end > len(mv):
+                break
+            yield fields, mv[offset + header.size : end]
+            offset = end
+        pending = pending[offset:]
+    # A short final record is passed through as-is, as zlib.decompress did.
+    if len(pending) >= header.size:
+        yield header.unpack_from(pending), memoryview(pending)[header.size:]
+
+def iter_snooz_payloads(compressed, header, lengths):
+    """
+    Yields the payload of each btsnooz record, using the record lengths
+    collected in the first pass instead of unpacking every header again.
+    """
+    lengths = iter(lengths)
+    length = next(lengths, None)
+    pending = b''
+    for chunk in inflate_snooz(compressed):
+        pending = pending + chunk
+        mv = memoryview(pending)
+        offset = 0
+        while length is not None:
+            end = offset + header.size + length - 1
+            if end > len(mv):
+                break
+            yield mv[offset + header.size : end]
+            offset = end
+            length = next(lengths, None)
+        pending = pending[offset:]
+    if length is not None and len(pending) >= header.size:
+        yield memoryview(pending)[header.size:]
+
 def decode_snooz(snooz, output_file):
     """
     Decodes all known versions of a btsnooz file into a btsnoop file.
@@ -58,79 +130,90 @@ def decode_snooz(snooz, output_file):
     sys.stderr.write(f'Found btsnooz version {version}\n')
     
     # Oddly, the file header (9 bytes) is not compressed, but the rest is.
-    decompressed = zlib.decompress(snooz[9:])
-    
-    sys.stderr.write(f'Decompressed {len(decompressed)} bytes of HCI data\n')
+    compressed = memoryview(snooz)[9:]
     
     # Write btsnoop file header
     output_file.write(b'btsnoop\x00\x00\x00\x00\x01\x00\x00\x03\xea')
     
     if version == 1:
-        decode_snooz_v1(decompressed, last_timestamp_ms, output_file)
+        decode_snooz_v1(compressed, last_timestamp_ms, output_file)
     elif version == 2:
-        decode_snooz_v2(decompressed, last_timestamp_ms, output_file)
+        decode_snooz_v2(compressed, last_timestamp_ms, output_file)
 
-def decode_snooz_v1(decompressed, last_timestamp_ms, output_file):
+def decode_snooz_v1(compressed, last_timestamp_ms, output_file):
     """
     Decodes btsnooz v1 files into a btsnoop file.
     """
     first_timestamp_ms = last_timestamp_ms + 0x00dcddb30f2f8000
-    offset = 0
     packet_count = 0
+    decompressed_size = 0
     
     # First pass to determine the timestamp of the first packet.
-    while offset < len(decompressed):
-        length, delta_time_ms, pkt_type = struct.unpack_from('=HIb', decompressed, offset)
-        offset += 7 + length - 1
+    lengths, deltas, types = array('H'), array('I'), array('b')
+    for (length, delta_time_ms, pkt_type), payload in iter_snooz_records(compressed, SNOOZ_V1_HEADER):
         first_timestamp_ms -= delta_time_ms
         packet_count += 1
+        decompressed_size += SNOOZ_V1_HEADER.size + len(payload)
+        lengths.append(length)
+        deltas.append(delta_time_ms)
+        types.append(pkt_type)
     
+    sys.stderr.write(f'Decompressed {decompressed_size} bytes of HCI data\n')
     sys.stderr.write(f'Found {packet_count} packets (v1)\n')
     
-    # Second pass does the actual writing out.
-    offset = 0
-    while offset < len(decompressed):
-        length, delta_time_ms, pkt_type = struct.unpack_from('=HIb', decompressed, offset)
+    # Second pass stages records in a buffer that is flushed every OUTPUT_FLUSH_SIZE bytes.
+    out = bytearray()
+    payloads = iter_snooz_payloads(compressed, SNOOZ_V1_HEADER, lengths)
+    for payload, length, delta_time_ms, pkt_type in zip(payloads, lengths, deltas, types):
         first_timestamp_ms += delta_time_ms
-        offset += 7
         
-        output_file.write(struct.pack('>II', length, length))
-        output_file.write(struct.pack('>II', type_to_direction(pkt_type), 0))
-        output_file.write(struct.pack('>II', (first_timestamp_ms >> 32), (first_timestamp_ms & 0xFFFFFFFF)))
-        output_file.write(type_to_hci(pkt_type))
-        output_file.write(decompressed[offset : offset + length - 1])
-        offset += length - 1
+        out += BTSNOOP_RECORD.pack(length, length, type_to_direction(pkt_type), 0,
+                                   first_timestamp_ms >> 32, first_timestamp_ms & 0xFFFFFFFF,
+                                   type_to_hci(pkt_type)[0])
+        out += payload
+        if len(out) >= OUTPUT_FLUSH_SIZE:
+            output_file.write(out)
+            out.clear()
+    
+    output_file.write(out)
 
-def decode_snooz_v2(decompressed, last_timestamp_ms, output_file):
+def decode_snooz_v2(compressed, last_timestamp_ms, output_file):
     """
     Decodes btsnooz v2 files into a btsnoop file.
     """
     first_timestamp_ms = last_timestamp_ms + 0x00dcddb30f2f8000
-    offset = 0
     packet_count = 0
+    decompressed_size = 0
     
     # First pass to determine the timestamp of the first packet.
-    while offset < len(decompressed):
-        length, packet_length, delta_time_ms, snooz_type = struct.unpack_from('=HHIb', decompressed, offset)
-        offset += 9 + length - 1
+    lengths, packet_lengths, deltas, types = array('H'), array('H'), array('I'), array('b')
+    for (length, packet_length, delta_time_ms, snooz_type), payload in iter_snooz_records(compressed, SNOOZ_V2_HEADER):
         first_timestamp_ms -= delta_time_ms
         packet_count += 1
+        decompressed_size += SNOOZ_V2_HEADER.size + len(payload)
+        lengths.append(length)
+        packet_lengths.append(packet_length)
+        deltas.append(delta_time_ms)
+        types.append(snooz_type)
     
+    sys.stderr.write(f'Decompressed {decompressed_size} bytes of HCI data\n')
     sys.stderr.write(f'Found {packet_count} packets (v2)\n')
     
-    # Second pass does the actual writing out.
-    offset = 0
-    while offset < len(decompressed):
-        length, packet_length, delta_time_ms, snooz_type = struct.unpack_from('=HHIb', decompressed, offset)
+    # Second pass stages records in a buffer that is flushed every OUTPUT_FLUSH_SIZE bytes.
+    out = bytearray()
+    payloads = iter_snooz_payloads(compressed, SNOOZ_V2_HEADER, lengths)
+    for payload, length, packet_length, delta_time_ms, snooz_type in zip(payloads, lengths, packet_lengths, deltas, types):
         first_timestamp_ms += delta_time_ms
-        offset += 9
         
-        output_file.write(struct.pack('>II', packet_length, length))
-        output_file.write(struct.pack('>II', type_to_direction(snooz_type), 0))
-        output_file.write(struct.pack('>II', (first_timestamp_ms >> 32), (first_timestamp_ms & 0xFFFFFFFF)))
-        output_file.write(type_to_hci(snooz_type))
-        output_file.write(decompressed[offset : offset + length - 1])
-        offset += length - 1
+        out += BTSNOOP_RECORD.pack(packet_length, length, type_to_direction(snooz_type), 0,
+                                   first_timestamp_ms >> 32, first_timestamp_ms & 0xFFFFFFFF,
+                                   type_to_hci(snooz_type)[0])
+        out += payload
+        if len(out) >= OUTPUT_FLUSH_SIZE:
+            output_file.write(out)
+            out.clear()
+    
+    output_file.write(out)
 
 def main():
     if len(sys.argv) < 2:
@@ -2,18 +2,24 @@ import asyncio
 import logging
 import struct
 from bleak import BleakClient, BleakScanner
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from bleak.exc import BleakError
+from PIL import Image, ImageDraw, ImageFont
 
 # --- CONFIGURATION ---
 PRINTER_NAME = "LX-D01" # We will search for this
 PRINT_WIDTH_PX = 384    # Standard for these 58mm printers
+MAX_IN_FLIGHT_WRITES = 4  # Pipelined line writes before waiting on the stack
+KNOWN_WRITE_UUIDS = (
+    "0000ae01-0000-1000-8000-00805f9b34fb",
+    "0000ae10-0000-1000-8000-00805f9b34fb",
+)
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%H:%M:%S')
 logger = logging.getLogger(__name__)
 
 # --- CRC8 IMPLEMENTATION (From Article) ---
-CRC8_TABLE = [
+CRC8_TABLE = bytes([
     0x00, 0x07, 0x0E, 0x09, 0x1C, 0x1B, 0x12, 0x15, 0x38, 0x3F, 0x36, 0x31, 0x24, 0x23, 0x2A, 0x2D,
     0x70, 0x77, 0x7E, 0x79, 0x6C, 0x6B, 0x62, 0x65, 0x48, 0x4F, 0x46, 0x41, 0x54, 0x53, 0x5A, 0x5D,
     0xE0, 0xE7, 0xEE, 0xE9, 0xFC, 0xFB, 0xF2, 0xF5, 0xD8, 0xDF, 0xD6, 0xD1, 0xC4, 0xC3, 0xCA, 0xCD,
@@ -30,9 +36,34 @@ CRC8_TABLE = [
     0x3E, 0x39, 0x30, 0x37, 0x22, 0x25, 0x2C, 0x2B, 0x06, 0x01, 0x08, 0x0F, 0x1A, 0x1D, 0x14, 0x13,
     0xAE, 0xA9, 0xA0, 0xA7, 0xB2, 0xB5, 0xBC, 0xBB, 0x96, 0x91, 0x98, 0x9F, 0x8A, 0x8D, 0x84, 0x83,
     0xDE, 0xD9, 0xD0, 0xD7, 0xC2, 0xC5, 0xCC, 0xCB, 0xE6, 0xE1, 0xE8, 0xEF, 0xFA, 0xFD, 0xF4, 0xF3
-]
+])
+
+# numpy and Numba are optional: with them the per-line CRC runs as native code
+# and rows are packed in one call, without them we fall back to plain loops.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+if np is None:
+    njit = None
+
+if njit is not None:
+    _CRC8_TABLE_U8 = np.frombuffer(CRC8_TABLE, dtype=np.uint8)
+
+    @njit(cache=True)
+    def _crc8_jit(buf, table):
+        crc = 0
+        for byte in buf:
+            crc = table[crc ^ byte]
+        return crc
 
 def calculate_crc8(data):
+    if njit is not None:
+        return int(_crc8_jit(np.frombuffer(bytes(data), dtype=np.uint8), _CRC8_TABLE_U8))
     crc = 0
     for byte in data:
         crc = CRC8_TABLE[(crc ^ byte) & 0xFF]
@@ -66,17 +97,49 @@ def format_message(command, data):
     
     return packet
 
+def format_messages(command, lines):
+    """
+    Builds the frames for a run of same-command messages up front, so the
+    print loop only has to write them. Same layout as format_message.
+    """
+    frames = []
+    header = None
+    for data in lines:
+        # Rows from image_to_bits all share one length, hence one header
+        if header is None or header[4] != len(data):
+            header = bytes([0x51, 0x78, command, 0x00, len(data), 0x00])
+        frames.append(b"".join((header, data, bytes((calculate_crc8(data), 0xFF)))))
+    return frames
+
+def batch_frames(frames, budget):
+    """
+    Concatenates whole frames into writes of at most `budget` bytes. The
+    printer parses [51 78 ... FF] frames back to back, so several rows can
+    share one GATT write.
+    """
+    batches = []
+    bulk = bytearray()
+    for frame in frames:
+        if bulk and len(bulk) + len(frame) > budget:
+            batches.append(bytes(bulk))
+            bulk.clear()
+        bulk += frame
+    if bulk:
+        batches.append(bytes(bulk))
+    return batches
+
 # --- IMAGE HELPERS ---
+# Loaded once; generate_test_image only needs them to measure and draw text
+try:
+    TEST_FONT = ImageFont.truetype("Arial.ttf", 40)
+except IOError:
+    TEST_FONT = ImageFont.load_default()
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('1', (1, 1)))
+
 def generate_test_image(text):
     """Generates a 384px wide image with text."""
-    try:
-        font = ImageFont.truetype("Arial.ttf", 40)
-    except IOError:
-        font = ImageFont.load_default()
-        
-    dummy = Image.new('1', (1, 1))
-    draw = ImageDraw.Draw(dummy)
-    bbox = draw.textbbox((0, 0), text, font=font)
+    font = TEST_FONT
+    bbox = _MEASURE_DRAW.textbbox((0, 0), text, font=font)
     h = bbox[3] - bbox[1] + 20
     
     # 1 (White) background, 0 (Black) text
@@ -95,25 +158,18 @@ def image_to_bits(img):
     Returns: list of bytearrays (one per line)
     """
     if img.width != PRINT_WIDTH_PX:
-        img = img.resize((PRINT_WIDTH_PX, int(img.height * (PRINT_WIDTH_PX / img.width))))
+        # Nearest: the 1-bit threshold below discards any filter smoothing
+        img = img.resize((PRINT_WIDTH_PX, int(img.height * (PRINT_WIDTH_PX / img.width))), Image.NEAREST)
     
-    # Invert (Printer 1=Black)
-    img = img.convert('L')
-    img = ImageOps.invert(img)
-    img = img.convert('1')
+    # Threshold + invert in one step (Printer 1=Black), then pack 8 px per byte
+    if np is not None:
+        arr = np.asarray(img.convert('L'), dtype=np.uint8)
+        packed = np.packbits(arr < 128, axis=1)
+        return [row.tobytes() for row in packed]
     
-    width, height = img.size
-    row_bytes = width // 8
-    data = img.tobytes()
-    
-    lines = []
-    for i in range(height):
-        start = i * row_bytes
-        end = start + row_bytes
-        line_data = data[start:end]
-        lines.append(line_data)
-        
-    return lines
+    data = img.convert('L').point(lambda v: 255 if v < 128 else 0, '1').tobytes()
+    row_bytes = (img.width + 7) // 8
+    return [data[i:i + row_bytes] for i in range(0, len(data), row_bytes)]
 
 # --- MAIN LOGIC ---
 async def main():
@@ -129,31 +185,39 @@ async def main():
     async with BleakClient(device) as client:
         logger.info("✅ Connected! Searching for Write Characteristic...")
         
+        # The article mentions AE01 or AE10: look those up directly by UUID.
+        # A UUID shared by several services raises BleakError; use the scan then.
         target_char = None
-        
-        # Hunt for the characteristic
-        for service in client.services:
-            for char in service.characteristics:
-                if "write" in char.properties or "write-without-response" in char.properties:
-                    # The article mentions AE01 or AE10. Let's look for those, or fallback to any Write
-                    str_uuid = str(char.uuid).upper()
-                    if "AE01" in str_uuid or "AE10" in str_uuid:
-                        target_char = char
-                        logger.info(f"🎯 FOUND KNOWN TARGET: {char.uuid}")
-                        break
-                    
-                    # Fallback
-                    if not target_char and "000018" not in str_uuid: # Ignore standard services
-                        target_char = char
-            if target_char and ("AE01" in str(target_char.uuid).upper() or "AE10" in str(target_char.uuid).upper()):
+        for uuid in KNOWN_WRITE_UUIDS:
+            try:
+                char = client.services.get_characteristic(uuid)
+            except BleakError:
+                continue
+            if char and {"write", "write-without-response"} & set(char.properties):
+                target_char = char
+                logger.info(f"🎯 FOUND KNOWN TARGET: {target_char.uuid}")
                 break
         
+        # Fallback: hunt for any Write characteristic
+        if not target_char:
+            for service in client.services:
+                for char in service.characteristics:
+                    if "write" in char.properties or "write-without-response" in char.properties:
+                        if "000018" not in str(char.uuid).upper(): # Ignore standard services
+                            target_char = char
+                            break
+                if target_char:
+                    break
+        
         if not target_char:
             logger.error("❌ No writable characteristic found!")
             return
             
         logger.info(f"🚀 Using Characteristic: {target_char.uuid}")
         
+        # Write Without Response when the characteristic allows it (no per-write ATT ack)
+        with_response = "write-without-response" not in target_char.properties
+        
         # --- COMMANDS ---
         CMD_FEED = 0xA1
         CMD_DRAW = 0xA2
@@ -161,7 +225,7 @@ async def main():
         
         # 1. Set Energy (Medium)
         energy_pkt = format_message(CMD_ENERGY, [0x01, 0x00]) # Example data
-        await client.write_gatt_char(target_char.uuid, energy_pkt)
+        await client.write_gatt_char(target_char, energy_pkt, response=with_response)
         await asyncio.sleep(0.1)
         
         # 2. Render Image
@@ -169,43 +233,54 @@ async def main():
         img = generate_test_image("CAT PROTOCOL!")
         lines = image_to_bits(img)
         
-        logger.info(f"🖨️ Printing {len(lines)} lines...")
+        frames = format_messages(CMD_DRAW, lines)
+        # As many rows per write as the negotiated MTU allows (3 bytes ATT header)
+        writes = batch_frames(frames, client.mtu_size - 3)
+        
+        logger.info(f"🖨️ Printing {len(lines)} lines in {len(writes)} writes (MTU {client.mtu_size})...")
         
         # 3. Print Loop
         # The article implies: Send Line Data -> Feed 1 unit -> Repeat
-        for i, line in enumerate(lines):
-            # Send Data (0xA2)
-            # Article says: "DrawBitmap command 0xA2 takes an array of bytes... each bit represents one pixel"
-            pkt_draw = format_message(CMD_DRAW, line)
-            await client.write_gatt_char(target_char.uuid, pkt_draw)
-            
-            # Feed 1 Step (0xA1) if necessary?
-            # Many of these printers require a "print buffer" command. 
-            # If 0xA2 is just "load buffer", we might need 0xA1 to "print buffer".
-            # Trying 0xA1 with 1 step.
-            # Article used [0x70, 0x00] for a big feed. Let's try [0x01, 0x00] for 1 line.
-            # pkt_feed = format_message(CMD_FEED, [0x01, 0x00])
-            # await client.write_gatt_char(target_char.uuid, pkt_feed)
-
-            # NOTE: Sending feed after every line is extremely slow on BLE.
-            # Usually, if you just send 0xA2 consecutively, it prints. 
-            # If it doesn't print, uncomment the Feed packet above.
-            
-            if i % 10 == 0:
-                print(".", end="", flush=True)
-            
-            # Small delay to prevent buffer choke
-            await asyncio.sleep(0.01)
+        # Writes are pipelined: up to MAX_IN_FLIGHT_WRITES are outstanding at once.
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_WRITES)
+        async with asyncio.TaskGroup() as tg:
+            for i, pkt_draw in enumerate(writes):
+                # Send Data (0xA2)
+                # Article says: "DrawBitmap command 0xA2 takes an array of bytes... each bit represents one pixel"
+                await in_flight.acquire()
+                task = tg.create_task(client.write_gatt_char(target_char, pkt_draw, response=with_response))
+                task.add_done_callback(lambda _: in_flight.release())
+                
+                # Feed 1 Step (0xA1) if necessary?
+                # Many of these printers require a "print buffer" command. 
+                # If 0xA2 is just "load buffer", we might need 0xA1 to "print buffer".
+                # Trying 0xA1 with 1 step.
+                # Article used [0x70, 0x00] for a big feed. Let's try [0x01, 0x00] for 1 line.
+                # pkt_feed = format_message(CMD_FEED, [0x01, 0x00])
+                # await client.write_gatt_char(target_char, pkt_feed)
+
+                # NOTE: Sending feed after every line is extremely slow on BLE.
+                # Usually, if you just send 0xA2 consecutively, it prints. 
+                # If it doesn't print, uncomment the Feed packet above.
+                
+                if i % 10 == 0:
+                    print(".", end="", flush=True)
             
         print("")
         
         # 4. Final Feed
         logger.info("🛑 Feeding paper...")
         feed_pkt = format_message(CMD_FEED, [0x50, 0x00]) # Feed ~80 lines
-        await client.write_gatt_char(target_char.uuid, feed_pkt)
+        await client.write_gatt_char(target_char, feed_pkt, response=with_response)
         
         logger.info("✨ Done.")
         await asyncio.sleep(2)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop is optional (not available on Windows); fall back to the stock loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
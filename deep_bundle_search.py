@@ -1,6 +1,29 @@
+import itertools
+import mmap
 import os
 import re
 
+# Precompiled once: monitorCharacteristic calls (phase 5), quoted ffe/FFE
+# UUID fragments (phase 6), byte-array literals (phase 9) and CRC helper
+# names (phase 10).
+MONITOR_RE = re.compile(rb'monitorCharacteristic')
+UUID_RE = re.compile(rb'(["\'])(ffe|FFE)')
+HEX_PATTERNS = [
+    re.compile(rb'0x5[aA]\s*,\s*0x'),
+    re.compile(rb'\[0x5[aA]'),
+    re.compile(rb'new\s+Uint8Array\s*\(\s*\['),
+]
+CRC_RE = re.compile(rb'crc8|CRC8|calcCrc|calculateCrc|crcTable|crc_table|crcCalc')
+
+# Byte -> printable ASCII lookup tables for bytes.translate(): anything that
+# is not printable becomes '.', and INLINE_TABLE also flattens \t\n\r.
+PRINT_TABLE = bytes(b if 32 <= b < 127 or b in (9, 10, 13) else ord('.') for b in range(256))
+INLINE_TABLE = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+def sanitize(context, table=PRINT_TABLE):
+    """Render a bytes context as printable ASCII"""
+    return context.translate(table).decode('ascii')
+
 def extract_context(content, search_bytes, context_before=300, context_after=500):
     """Extract larger context around a pattern"""
     idx = content.find(search_bytes)
@@ -10,12 +33,8 @@ def extract_context(content, search_bytes, context_before=300, context_after=500
     end = min(len(content), idx + len(search_bytes) + context_after)
     return content[start:end]
 
-def main():
-    filepath = r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk\assets\index.android.bundle"
-    
-    with open(filepath, 'rb') as f:
-        content = f.read()
-    
+def search_bundle(content):
+    """Run every search phase over the bundle contents (bytes or mmap)"""
     print("="*80)
     print("1. SEARCHING FOR 'low crc error' CONTEXT")
     print("="*80)
@@ -24,8 +43,7 @@ def main():
     context = extract_context(content, b'low crc error', 500, 800)
     if context:
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(s)
         except:
             pass
@@ -37,8 +55,7 @@ def main():
     context = extract_context(content, b'ffe1 characteristic not found', 300, 500)
     if context:
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(s)
         except:
             pass
@@ -50,8 +67,7 @@ def main():
     context = extract_context(content, b'ffe2 characteristic not found', 300, 500)
     if context:
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(s)
         except:
             pass
@@ -63,8 +79,7 @@ def main():
     context = extract_context(content, b'sendDataToDevice', 300, 500)
     if context:
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(s)
         except:
             pass
@@ -73,22 +88,16 @@ def main():
     print("5. SEARCHING FOR 'monitorCharacteristic' CONTEXTS (all)")
     print("="*80)
     
-    idx = 0
-    count = 0
-    while count < 5:
-        idx = content.find(b'monitorCharacteristic', idx)
-        if idx == -1:
-            break
+    # finditer resumes after each match; islice stops after the first 5
+    for count, m in enumerate(itertools.islice(MONITOR_RE.finditer(content), 5)):
+        idx = m.start()
         context = content[max(0, idx-200):min(len(content), idx+400)]
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(f"\n--- Match {count+1} ---")
             print(s)
         except:
             pass
-        idx += 1
-        count += 1
 
     print("\n" + "="*80)
     print("6. SEARCHING FOR SERVICE UUID PATTERNS")
@@ -96,27 +105,16 @@ def main():
     
     # Search for quoted hex strings that look like UUIDs
     # Looking for patterns like "ffe6" or "FFE6" in context of services
-    uuid_patterns = [
-        (b'"ffe', 'Double-quoted ffe'),
-        (b"'ffe", 'Single-quoted ffe'),
-        (b'"FFE', 'Double-quoted FFE'),
-        (b"'FFE", 'Single-quoted FFE'),
-    ]
-    
-    for pattern, name in uuid_patterns:
-        idx = 0
-        while True:
-            idx = content.find(pattern, idx)
-            if idx == -1:
-                break
-            context = content[max(0, idx-50):min(len(content), idx+100)]
-            try:
-                s = context.decode('utf-8', errors='replace')
-                s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
-                print(f"\n[{name}] at {idx}: ...{s}...")
-            except:
-                pass
-            idx += 1
+    for m in UUID_RE.finditer(content):
+        quote = 'Double-quoted' if m.group(1) == b'"' else 'Single-quoted'
+        name = f"{quote} {m.group(2).decode()}"
+        idx = m.start()
+        context = content[max(0, idx-50):min(len(content), idx+100)]
+        try:
+            s = sanitize(context)
+            print(f"\n[{name}] at {idx}: ...{s}...")
+        except:
+            pass
     
     print("\n" + "="*80)
     print("7. SEARCHING FOR 'writeCharacteristicForDevice' CONTEXT")
@@ -125,8 +123,7 @@ def main():
     context = extract_context(content, b'writeCharacteristicForDevice', 400, 600)
     if context:
         try:
-            s = context.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+            s = sanitize(context)
             print(s)
         except:
             pass
@@ -139,8 +136,7 @@ def main():
         context = extract_context(content, pattern, 300, 500)
         if context:
             try:
-                s = context.decode('utf-8', errors='replace')
-                s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
+                s = sanitize(context)
                 print(f"\n[{pattern.decode()}]:")
                 print(s)
             except:
@@ -151,47 +147,47 @@ def main():
     print("="*80)
     
     # Look for things like [0x5a, 0x02] or similar
-    hex_patterns = [
-        rb'0x5[aA]\s*,\s*0x',
-        rb'\[0x5[aA]',
-        rb'new\s+Uint8Array\s*\(\s*\[',
-    ]
-    
-    for pattern in hex_patterns:
-        matches = list(re.finditer(pattern, content))
-        print(f"\nPattern '{pattern.decode()}': {len(matches)} matches")
+    for pattern in HEX_PATTERNS:
+        matches = list(pattern.finditer(content))
+        print(f"\nPattern '{pattern.pattern.decode()}': {len(matches)} matches")
         for m in matches[:3]:
             start = max(0, m.start() - 30)
             end = min(len(content), m.end() + 150)
-            context = content[start:end].decode('utf-8', errors='replace')
-            context = ''.join(c if c.isprintable() else '.' for c in context)
+            context = sanitize(content[start:end], INLINE_TABLE)
             print(f"  ...{context}...")
 
     print("\n" + "="*80)
     print("10. SEARCHING FOR CRC CALCULATION PATTERNS")
     print("="*80)
     
-    # CRC patterns
-    crc_patterns = [
-        b'crc8',
-        b'CRC8',
-        b'calcCrc',
-        b'calculateCrc',
-        b'crcTable',
-        b'crc_table',
-        b'crcCalc',
-    ]
-    
-    for pattern in crc_patterns:
-        context = extract_context(content, pattern, 200, 400)
-        if context:
-            try:
-                s = context.decode('utf-8', errors='replace')
-                s = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in s)
-                print(f"\n[{pattern.decode()}]:")
-                print(s)
-            except:
-                pass
+    # One pass over the bundle; print the first hit of each CRC name
+    seen = set()
+    for m in CRC_RE.finditer(content):
+        pattern = m.group()
+        if pattern in seen:
+            continue
+        seen.add(pattern)
+        start = max(0, m.start() - 200)
+        end = min(len(content), m.end() + 400)
+        context = content[start:end]
+        try:
+            s = sanitize(context)
+            print(f"\n[{pattern.decode()}]:")
+            print(s)
+        except:
+            pass
+
+def main():
+    filepath = r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk\assets\index.android.bundle"
+    
+    # Map the bundle instead of reading it into memory; find(), slicing and
+    # re.finditer() all work on the mmap directly.
+    with open(filepath, 'rb') as f:
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        search_bundle(content)
+    finally:
+        content.close()
 
 if __name__ == "__main__":
     main()
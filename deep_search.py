@@ -1,37 +1,179 @@
+import json
 import os
 import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-def search_in_dex_files(directory, patterns):
-    """Search for patterns in all DEX files"""
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Default output; pass --pretty for the human-readable report instead
+RESULTS_JSON = "search_results.json"
+
+def build_automaton(patterns):
+    """Build one Aho-Corasick automaton over all byte patterns.
+
+    pyahocorasick is built for str keys, so patterns (and DEX contents) go
+    through latin-1, which maps bytes 1:1 and keeps offsets intact.
+    """
+    automaton = ahocorasick.Automaton()
+    for pattern_name, pattern in patterns.items():
+        if isinstance(pattern, bytes):
+            automaton.add_word(pattern.decode('latin-1'), (pattern_name, pattern))
+    automaton.make_automaton()
+    return automaton
+
+# Byte -> printable ASCII lookup table for bytes.translate(); \t\n\r are kept
+PRINT_TABLE = bytes(b if 32 <= b < 127 or b in (9, 10, 13) else ord('.') for b in range(256))
+
+# DEX files are scanned in windows of this size rather than read whole
+SCAN_CHUNK_SIZE = 16 << 20
+
+def iter_window_matches(window, skip, patterns, automaton, found=()):
+    """
+    Yields (offset, pattern_name, pattern) for matches in window that do not
+    lie entirely within its first skip bytes (already scanned last window).
+    """
+    if automaton is None:
+        # No pyahocorasick: one find() pass per pattern, skipping patterns
+        # whose first match is already known
+        for pattern_name, pattern in patterns.items():
+            if isinstance(pattern, bytes) and pattern_name not in found:
+                idx = window.find(pattern, max(0, skip - len(pattern) + 1))
+                if idx != -1:
+                    yield idx, pattern_name, pattern
+        return
+    
+    for end_idx, (pattern_name, pattern) in automaton.iter(window.decode('latin-1')):
+        if end_idx >= skip:
+            yield end_idx - len(pattern) + 1, pattern_name, pattern
+
+def find_first_matches(filepath, patterns, automaton):
+    """
+    Map each pattern name to (file offset of its first match, pattern).
+    Windows overlap by the longest pattern minus one byte so matches that
+    straddle a chunk boundary are still found.
+    """
+    wanted = sum(1 for pattern in patterns.values() if isinstance(pattern, bytes))
+    overlap = max(len(pattern) for pattern in patterns.values() if isinstance(pattern, bytes)) - 1
+    first = {}
+    consumed = 0
+    tail = b''
+    with open(filepath, 'rb') as f:
+        while len(first) < wanted:
+            buf = f.read(SCAN_CHUNK_SIZE)
+            if not buf:
+                break
+            window = tail + buf
+            window_offset = consumed - len(tail)
+            for idx, pattern_name, pattern in iter_window_matches(window, len(tail), patterns, automaton, first):
+                if pattern_name not in first:
+                    first[pattern_name] = (window_offset + idx, pattern)
+            tail = window[max(0, len(window) - overlap):]
+            consumed += len(buf)
+    return first
+
+# Automatons built in this (worker) process, keyed by their pattern table
+_automatons = {}
+
+def get_automaton(patterns):
+    """Build the automaton for a pattern table once per (worker) process"""
+    if not ahocorasick:
+        return None
+    key = tuple(patterns.items())
+    automaton = _automatons.get(key)
+    if automaton is None:
+        automaton = _automatons[key] = build_automaton(patterns)
+    return automaton
+
+def scan_dex_file(filepath, patterns):
+    """Search one DEX file; returns {pattern_name: match}"""
     results = {}
+    try:
+        # All patterns are located in a single streaming pass over the file
+        matches = find_first_matches(filepath, patterns, get_automaton(patterns))
+        with open(filepath, 'rb') as f:
+            for pattern_name in patterns:
+                if pattern_name not in matches:
+                    continue
+                # Read the context around the match back from the file
+                idx, pattern = matches[pattern_name]
+                start = max(0, idx - 50)
+                f.seek(start)
+                results[pattern_name] = {
+                    'file': filepath,
+                    'context': f.read(idx + len(pattern) + 100 - start)
+                }
+    except Exception as e:
+        print(f"Error reading {filepath}: {e}")
     
+    return results
+
+def search_in_dex_files(directory, patterns):
+    """Search for patterns in all DEX files"""
+    dex_paths = []
     for root, dirs, files in os.walk(directory):
         for file in files:
             if file.endswith('.dex'):
-                filepath = os.path.join(root, file)
-                try:
-                    with open(filepath, 'rb') as f:
-                        content = f.read()
-                        
-                    for pattern_name, pattern in patterns.items():
-                        if isinstance(pattern, bytes):
-                            if pattern in content:
-                                if pattern_name not in results:
-                                    results[pattern_name] = []
-                                # Find context around the match
-                                idx = content.find(pattern)
-                                start = max(0, idx - 50)
-                                end = min(len(content), idx + len(pattern) + 100)
-                                context = content[start:end]
-                                results[pattern_name].append({
-                                    'file': filepath,
-                                    'context': context
-                                })
-                except Exception as e:
-                    print(f"Error reading {filepath}: {e}")
+                dex_paths.append(os.path.join(root, file))
+    
+    # The classesN.dex shards are independent, so scan them in parallel
+    if len(dex_paths) > 1:
+        with ProcessPoolExecutor() as executor:
+            partials = list(executor.map(scan_dex_file, dex_paths, repeat(patterns)))
+    else:
+        partials = [scan_dex_file(path, patterns) for path in dex_paths]
+    
+    results = defaultdict(list)
+    for partial in partials:
+        for pattern_name, match in partial.items():
+            results[pattern_name].append(match)
     
     return results
 
+def write_results_json(results, path):
+    """Write {pattern_name: [{'file', 'context' (hex)}]} as one JSON document"""
+    data = {
+        pattern_name: [{'file': m['file'], 'context': m['context'].hex()} for m in matches]
+        for pattern_name, matches in results.items()
+    }
+    if orjson:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+def print_results(results, patterns):
+    """Print the human-readable search report"""
+    print("\n" + "="*80)
+    print("SEARCH RESULTS")
+    print("="*80)
+    
+    for pattern_name, matches in sorted(results.items()):
+        print(f"\n[FOUND] {pattern_name}: {len(matches)} match(es)")
+        for match in matches[:3]:  # Show first 3 matches
+            print(f"  File: {match['file']}")
+            # Render the context as ASCII, non-printable bytes as '.'
+            context_str = match['context'].translate(PRINT_TABLE).decode('ascii')
+            print(f"  Context: {context_str[:200]}")
+    
+    # Patterns not found
+    not_found = [p for p in patterns.keys() if p not in results]
+    if not_found:
+        print(f"\n[NOT FOUND] {len(not_found)} patterns: {', '.join(not_found[:20])}")
+        if len(not_found) > 20:
+            print(f"  ... and {len(not_found) - 20} more")
+
 def main():
     directory = r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk"
     
@@ -118,29 +260,11 @@ def main():
     print("Searching DEX files for BLE patterns...")
     results = search_in_dex_files(directory, patterns)
     
-    print("\n" + "="*80)
-    print("SEARCH RESULTS")
-    print("="*80)
-    
-    for pattern_name, matches in sorted(results.items()):
-        print(f"\n[FOUND] {pattern_name}: {len(matches)} match(es)")
-        for match in matches[:3]:  # Show first 3 matches
-            print(f"  File: {match['file']}")
-            # Try to decode context as ASCII where possible
-            try:
-                context_str = match['context'].decode('utf-8', errors='replace')
-                # Clean up non-printable chars
-                context_str = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in context_str)
-                print(f"  Context: {context_str[:200]}")
-            except:
-                print(f"  Context (hex): {match['context'][:100].hex()}")
-    
-    # Patterns not found
-    not_found = [p for p in patterns.keys() if p not in results]
-    if not_found:
-        print(f"\n[NOT FOUND] {len(not_found)} patterns: {', '.join(not_found[:20])}")
-        if len(not_found) > 20:
-            print(f"  ... and {len(not_found) - 20} more")
+    if '--pretty' in sys.argv[1:]:
+        print_results(results, patterns)
+    else:
+        write_results_json(results, RESULTS_JSON)
+        print(f"Wrote {len(results)} matched patterns to {RESULTS_JSON} (--pretty for a text report)")
 
 if __name__ == "__main__":
     main()
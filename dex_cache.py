@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Pickle cache for androguard DEX parse results.
+
+Parsing a classesN.dex rebuilds its whole string/class/method index, so the
+parts the extract_* scripts use are saved under .dexcache/ keyed by the
+file's mtime and size, and reused on later runs. Passes that only need the
+string table can use dex_strings(), which skips androguard entirely.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from androguard.core.dex import DEX
+
+CACHE_DIR = Path(__file__).resolve().parent / ".dexcache"
+
+def load_dex(path):
+    """
+    Returns {'strings': [str, ...],
+             'classes': [(class_name, [(method_name, descriptor), ...]), ...]}
+    for a DEX file, parsing it only if there is no cache entry yet.
+    """
+    path = Path(path)
+    stat = path.stat()
+    cache_file = CACHE_DIR / f"{path.name}.{stat.st_mtime_ns}.{stat.st_size}.pkl"
+    if cache_file.exists():
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    d = DEX(path.read_bytes())
+    data = {
+        'strings': list(d.get_strings()),
+        'classes': [
+            (cls.get_name(), [(m.get_name(), m.get_descriptor()) for m in cls.get_methods()])
+            for cls in d.get_classes()
+        ],
+    }
+
+    # Written under a temporary name first, so an interrupted run can't
+    # leave a truncated entry behind
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_file = cache_file.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(data, f, protocol=4)
+    os.replace(tmp_file, cache_file)
+    return data
+
+def dex_strings(path):
+    """
+    Yields the string table of a DEX file without androguard. The header
+    gives string_ids_size/string_ids_off at 0x38; each id points at a
+    ULEB128 length followed by NUL-terminated MUTF-8, decoded as UTF-8.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        count, ids_off = struct.unpack_from('<II', mm, 0x38)
+        for data_off in struct.unpack_from(f'<{count}I', mm, ids_off):
+            # Skip the ULEB128 utf16_size
+            while mm[data_off] & 0x80:
+                data_off += 1
+            data_off += 1
+            end = mm.find(b'\x00', data_off)
+            yield mm[data_off:end].decode('utf-8', 'replace')
@@ -5,11 +5,15 @@ Automated DEX to Smali conversion (disassembly) for protocol analysis
 This doesn't require external tools, just uses androguard's built-in capabilities
 """
 
+import heapq
 import os
+import re
 import sys
+from multiprocessing import Pool
 from pathlib import Path
 from androguard.core.dex import DEX
 from androguard.core.analysis.analysis import Analysis
+from androguard.decompiler.decompiler import DecompilerDAD
 
 # Fix encoding for Windows
 import io
@@ -19,115 +23,153 @@ APK_DIR = Path(r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk")
 OUTPUT_DIR = Path(r"c:\Users\maxgo\Downloads\Sentimo\decompiled_output")
 OUTPUT_DIR.mkdir(exist_ok=True)
 
-print("\n" + "="*80)
-print("DEX DISASSEMBLY - PRINTER SDK FOCUS")
-print("="*80)
+# Write the buffered method listing out every this many lines
+OUTPUT_BATCH_LINES = 4096
 
-# Focus on classes2.dex which likely contains printer SDK
-target_dex = APK_DIR / "classes2.dex"
+# Keyword filters fused into one regex each, run on lowercased names/strings
+CLASS_KW_RE = re.compile('print|send|write|command|cmd|ble|device|ask|lx|thermal')
+STRING_KW_RE = re.compile('byte|command|send|print|ffe|5833|data|write')
+KEY_METHOD_RE = re.compile('send|write|print|execute')
+KEY_CLASS_RE = re.compile('print|ble|device|ask')
 
-if target_dex.exists():
-    print(f"\nAnalyzing {target_dex.name}...")
-    d = DEX(target_dex.read_bytes())
-    dx = Analysis(d)
-    
-    # Search for printer-related classes
-    print("\nSearching for printer/BLE related classes...")
+# Per-process DEX with a decompiler attached, built on first use in each worker
+_worker_dex = {}
+
+def load_decompiled_dex(dex_path):
+    d = _worker_dex.get(dex_path)
+    if d is None:
+        d = DEX(Path(dex_path).read_bytes())
+        d.set_decompiler(DecompilerDAD(d, Analysis(d)))
+        _worker_dex[dex_path] = d
+    return d
+
+def dump_class(args):
+    """Return the output lines for one class: its header, methods and source"""
+    dex_path, class_index = args
+    cls = load_decompiled_dex(dex_path).get_classes()[class_index]
+    lines = [
+        f"\n{'='*80}\n",
+        f"CLASS: {cls.get_name()}\n",
+        f"{'='*80}\n",
+    ]
     
-    output_file = OUTPUT_DIR / "classes2_extracted_methods.txt"
-    with open(output_file, 'w', encoding='utf-8', errors='ignore') as f:
-        f.write("="*80 + "\n")
-        f.write("PRINTER AND BLE RELATED METHODS\n")
-        f.write("="*80 + "\n\n")
-        
-        for cls in d.get_classes():
-            class_name = cls.get_name()
-            
-            # Filter for interesting classes
-            if any(keyword in class_name.lower() for keyword in [
-                'printer', 'print', 'send', 'write', 'command', 'cmd', 'ble', 
-                'device', 'ask', 'lx', 'thermal'
-            ]):
-                f.write(f"\n{'='*80}\n")
-                f.write(f"CLASS: {class_name}\n")
-                f.write(f"{'='*80}\n")
-                
-                # Get all methods
-                for method in cls.get_methods():
-                    method_name = method.get_name()
-                    
-                    f.write(f"\n  METHOD: {method_name}\n")
-                    
-                    # Try to get source/code
-                    try:
-                        source = method.get_source()
-                        if source and len(source) > 0:
-                            lines = source.split('\n')[:20]  # First 20 lines
-                            f.write(f"  Source:\n")
-                            for line in lines:
-                                if line.strip():
-                                    f.write(f"    {line}\n")
-                    except Exception as e:
-                        pass
+    # Get all methods
+    for method in cls.get_methods():
+        method_name = method.get_name()
         
-        # Also extract all string constants that look like commands
-        f.write("\n\n" + "="*80 + "\n")
-        f.write("POTENTIALLY RELEVANT STRING CONSTANTS\n")
-        f.write("="*80 + "\n\n")
+        lines.append(f"\n  METHOD: {method_name}\n")
         
-        string_keywords = ['byte', 'command', 'send', 'print', 'ffe', '5833', 'data', 'write']
-        relevant_strings = []
+        # Try to get source/code
+        try:
+            source = method.get_source()
+            if source and len(source) > 0:
+                source_lines = source.split('\n')[:20]  # First 20 lines
+                lines.append(f"  Source:\n")
+                for line in source_lines:
+                    if line.strip():
+                        lines.append(f"    {line}\n")
+        except Exception as e:
+            pass
+    return lines
+
+def main():
+    print("\n" + "="*80)
+    print("DEX DISASSEMBLY - PRINTER SDK FOCUS")
+    print("="*80)
+
+    # Focus on classes2.dex which likely contains printer SDK
+    target_dex = APK_DIR / "classes2.dex"
+
+    if target_dex.exists():
+        print(f"\nAnalyzing {target_dex.name}...")
+        d = DEX(target_dex.read_bytes())
+        dx = Analysis(d)
         
-        for string_val in d.get_strings():
-            if any(kw in string_val.lower() for kw in string_keywords):
-                if len(string_val) > 3 and len(string_val) < 200:
-                    relevant_strings.append(string_val)
+        # Search for printer-related classes
+        print("\nSearching for printer/BLE related classes...")
         
-        # Deduplicate and sort
-        relevant_strings = sorted(set(relevant_strings))
-        for s in relevant_strings[:100]:  # First 100 unique strings
-            f.write(f"  {s}\n")
+        output_file = OUTPUT_DIR / "classes2_extracted_methods.txt"
+        # Lines are collected in a list and written in batches rather than one
+        # write() call per line
+        with open(output_file, 'w', encoding='utf-8', errors='ignore', buffering=1 << 20) as f:
+            out = []
+            out.append("="*80 + "\n")
+            out.append("PRINTER AND BLE RELATED METHODS\n")
+            out.append("="*80 + "\n\n")
+            
+            # Decompiling is CPU-bound and independent per class, so the
+            # matching classes are spread over a process pool; imap keeps
+            # them in file order
+            class_indices = [i for i, cls in enumerate(d.get_classes())
+                             if CLASS_KW_RE.search(cls.get_name().lower())]
+            with Pool() as pool:
+                tasks = [(str(target_dex), i) for i in class_indices]
+                for lines in pool.imap(dump_class, tasks, chunksize=16):
+                    out.extend(lines)
+                    if len(out) >= OUTPUT_BATCH_LINES:
+                        f.writelines(out)
+                        out.clear()
+            
+            # Also extract all string constants that look like commands
+            out.append("\n\n" + "="*80 + "\n")
+            out.append("POTENTIALLY RELEVANT STRING CONSTANTS\n")
+            out.append("="*80 + "\n\n")
+            
+            relevant_strings = set()
+            
+            for string_val in d.get_strings():
+                if 3 < len(string_val) < 200 and STRING_KW_RE.search(string_val.lower()):
+                    relevant_strings.add(string_val)
+            
+            # First 100 unique strings in sorted order, without sorting them all
+            for s in heapq.nsmallest(100, relevant_strings):
+                out.append(f"  {s}\n")
+            
+            f.writelines(out)
 
-    print(f"[OK] Extracted methods saved to: {output_file}")
-    print(f"     Size: {output_file.stat().st_size} bytes")
-    
-    # Also scan for specific method implementations
-    print("\n[INFO] Looking for key method implementations...")
-    
-    # Get bytecode for methods of interest
-    found_methods = []
-    for method in dx.get_methods():
-        method_name = method.get_name()
-        class_name = method.get_class_name()
+        print(f"[OK] Extracted methods saved to: {output_file}")
+        print(f"     Size: {output_file.stat().st_size} bytes")
         
-        if any(kw in method_name.lower() for kw in ['send', 'write', 'print', 'execute']):
-            if any(kw in class_name.lower() for kw in ['print', 'ble', 'device', 'ask']):
-                found_methods.append({
-                    'class': class_name,
-                    'method': method_name,
-                    'proto': str(method.get_proto()),
-                })
-                print(f"  [FOUND] {class_name}.{method_name}()")
-    
-    # Write detailed method analysis
-    if found_methods:
-        output_file2 = OUTPUT_DIR / "KEY_METHODS_DETAIL.txt"
-        with open(output_file2, 'w', encoding='utf-8', errors='ignore') as f:
-            f.write("KEY SEND/WRITE/PRINT METHODS\n")
-            f.write("="*80 + "\n\n")
+        # Also scan for specific method implementations
+        print("\n[INFO] Looking for key method implementations...")
+        
+        # Get bytecode for methods of interest
+        found_methods = []
+        for method in dx.get_methods():
+            method_name = method.get_name()
+            class_name = method.get_class_name()
             
-            for m in found_methods:
-                f.write(f"Class: {m['class']}\n")
-                f.write(f"Method: {m['method']}\n")
-                f.write(f"Signature: {m['proto']}\n")
-                f.write("-"*40 + "\n\n")
+            if KEY_METHOD_RE.search(method_name.lower()):
+                if KEY_CLASS_RE.search(class_name.lower()):
+                    found_methods.append({
+                        'class': class_name,
+                        'method': method_name,
+                        'proto': str(method.get_proto()),
+                    })
+                    print(f"  [FOUND] {class_name}.{method_name}()")
         
-        print(f"[OK] Key methods details saved to: {output_file2}")
+        # Write detailed method analysis
+        if found_methods:
+            output_file2 = OUTPUT_DIR / "KEY_METHODS_DETAIL.txt"
+            with open(output_file2, 'w', encoding='utf-8', errors='ignore') as f:
+                f.write("KEY SEND/WRITE/PRINT METHODS\n")
+                f.write("="*80 + "\n\n")
+                
+                for m in found_methods:
+                    f.write(f"Class: {m['class']}\n")
+                    f.write(f"Method: {m['method']}\n")
+                    f.write(f"Signature: {m['proto']}\n")
+                    f.write("-"*40 + "\n\n")
+            
+            print(f"[OK] Key methods details saved to: {output_file2}")
+
+    print("\n" + "="*80)
+    print("[SUCCESS] EXTRACTION COMPLETE")
+    print("="*80)
+    print(f"Output directory: {OUTPUT_DIR}")
+    print("\n[NEXT] Use online decompiler for full source code")
+    print("       https://www.decompiler.com/")
+    print("       Upload: classes2.dex")
 
-print("\n" + "="*80)
-print("[SUCCESS] EXTRACTION COMPLETE")
-print("="*80)
-print(f"Output directory: {OUTPUT_DIR}")
-print("\n[NEXT] Use online decompiler for full source code")
-print("       https://www.decompiler.com/")
-print("       Upload: classes2.dex")
+if __name__ == "__main__":
+    main()
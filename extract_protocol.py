@@ -9,11 +9,16 @@ import sys
 import re
 from pathlib import Path
 from androguard.misc import AnalyzeAPK
-from androguard.core.dex import DEX
+from dex_cache import dex_strings
 
 # Path to the extracted APK
 APK_DIR = Path(r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk")
 
+# Run on the lowercased string. The two are separate searches because a
+# string can land in both candidate sets.
+UUID_KW_RE = re.compile('ffe|5833')
+FUNC_KW_RE = re.compile('send|write|command|data|print|byte')
+
 print("=" * 80)
 print("LX-D01 PRINTER PROTOCOL EXTRACTION TOOL")
 print("=" * 80)
@@ -33,19 +38,18 @@ protocol_candidates = {
 for dex_file in sorted(dex_files):
     print(f"Analyzing {dex_file.name}...")
     try:
-        d = DEX(dex_file.read_bytes())
-        
         # Extract all strings from the DEX file
-        for string_value in d.get_strings():
+        for string_value in dex_strings(dex_file):
             if string_value:
                 all_strings.add(string_value)
+                lowered = string_value.lower()
                 
                 # Look for UUIDs
-                if "ffe" in string_value.lower() or "5833" in string_value:
+                if UUID_KW_RE.search(lowered):
                     protocol_candidates['uuids'].add(string_value)
                 
                 # Look for command-related strings
-                if any(x in string_value.lower() for x in ['send', 'write', 'command', 'data', 'print', 'byte']):
+                if FUNC_KW_RE.search(lowered):
                     protocol_candidates['function_calls'].add(string_value)
                     
     except Exception as e:
@@ -4,15 +4,65 @@ Deep protocol extraction from FunnyPrint APK.
 Focus on BLE write operations and command sequences.
 """
 
+import atexit
+import mmap
 import os
 import struct
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from androguard.core.dex import DEX
+from dex_cache import dex_strings, load_dex
 
 APK_DIR = Path(r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk")
 BUNDLE_FILE = APK_DIR / "assets" / "index.android.bundle"
 
+# Full 128-bit UUID, matched against the lowercased string
+UUID36_RE = re.compile(r'[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}')
+
+# Phase 4 class/method name filters, run on lowercased names
+WRITE_CLASS_RE = re.compile('print|ble|write|send|cmd')
+WRITE_METHOD_RE = re.compile('send|write|cmd|data|print')
+
+def count_bytes(data, pattern):
+    """bytes.count() for an mmap, which has find() but no count()"""
+    count = 0
+    pos = data.find(pattern)
+    while pos != -1:
+        count += 1
+        pos = data.find(pattern, pos + len(pattern))
+    return count
+
+# Files mapped once per run and shared by every phase: name -> (file, mmap)
+_resources = {}
+
+def bundle():
+    """Map the bundle on first use rather than reading it all into memory"""
+    if 'bundle' not in _resources:
+        f = open(BUNDLE_FILE, 'rb')
+        _resources['bundle'] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    return _resources['bundle'][1]
+
+def close_resources():
+    for f, mapped in _resources.values():
+        mapped.close()
+        f.close()
+    _resources.clear()
+
+atexit.register(close_resources)
+
+def find_dex_uuids(dex_file):
+    """Return the interesting full UUID strings in one DEX file"""
+    found = []
+    for string_val in dex_strings(dex_file):
+        # Look for UUID patterns; the length checks reject almost every
+        # string before the regex runs
+        if string_val and len(string_val) == 36 and string_val[8] == '-':
+            sv = string_val.lower()
+            if UUID36_RE.fullmatch(sv) and ('fff' in sv or '5833' in string_val):
+                found.append(string_val)
+    return found
+
 print("\n" + "=" * 80)
 print("PHASE 1: EXTRACTING BLE SERVICE/CHARACTERISTIC UUIDs")
 print("=" * 80)
@@ -21,25 +71,17 @@ print("=" * 80)
 all_dex_files = sorted(APK_DIR.glob("classes*.dex"))
 uuids_by_hex = {}
 
-for dex_file in all_dex_files:
-    print(f"\nAnalyzing {dex_file.name}...")
-    try:
-        d = DEX(dex_file.read_bytes())
-        for string_val in d.get_strings():
-            # Look for UUID patterns
-            if string_val and len(string_val) >= 8:
-                # Match full UUIDs or partial patterns
-                if re.match(r'^[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}$', string_val.lower()):
-                    if 'fff' in string_val.lower() or '5833' in string_val:
-                        uuids_by_hex[string_val] = True
-                        print(f"  Found UUID: {string_val}")
-                # Also check for 4-character UUID shortcuts
-                elif re.match(r'^[0-9a-f]{4}$', string_val) and int(string_val, 16) > 0:
-                    if 'fff' in string_val.lower() or '5833' in string_val.lower():
-                        uuids_by_hex[string_val] = True
-                        print(f"  Found short UUID: {string_val}")
-    except Exception as e:
-        print(f"  Error: {e}")
+# Each DEX is parsed on its own worker; results are printed in file order
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    futures = [(dex_file, executor.submit(find_dex_uuids, dex_file)) for dex_file in all_dex_files]
+    for dex_file, future in futures:
+        print(f"\nAnalyzing {dex_file.name}...")
+        try:
+            for string_val in future.result():
+                uuids_by_hex[string_val] = True
+                print(f"  Found UUID: {string_val}")
+        except Exception as e:
+            print(f"  Error: {e}")
 
 print("\n" + "=" * 80)
 print("PHASE 2: SEARCHING FOR COMMAND/WRITE SEQUENCES IN REACT NATIVE BUNDLE")
@@ -48,7 +90,7 @@ print("=" * 80)
 # Search React Native bundle for command patterns
 if BUNDLE_FILE.exists():
     print(f"\nAnalyzing React Native bundle: {BUNDLE_FILE.name}")
-    bundle_data = BUNDLE_FILE.read_bytes()
+    bundle_data = bundle()
     
     # Look for common printer command patterns
     # ESC sequences, device control codes, print data markers
@@ -68,27 +110,25 @@ if BUNDLE_FILE.exists():
     ]
     
     print("\n  Searching for ESC/GS command sequences...")
+    # One pass over the bundle for all sequences; none of them can overlap
+    # another, so the per-pattern counts match bytes.count()
+    esc_re = re.compile(b'|'.join(re.escape(pattern) for pattern, _ in patterns_to_search))
+    counts = Counter()
+    first_offsets = {}
+    for m in esc_re.finditer(bundle_data):
+        counts[m.group()] += 1
+        first_offsets.setdefault(m.group(), m.start())
+    
     for pattern, description in patterns_to_search:
-        count = bundle_data.count(pattern)
+        count = counts[pattern]
         if count > 0:
             print(f"    {description}: {count} occurrences")
-            # Find positions
-            pos = 0
-            occurrences = []
-            for _ in range(min(3, count)):  # Show first 3 occurrences
-                pos = bundle_data.find(pattern, pos)
-                if pos >= 0:
-                    # Get surrounding context (20 bytes before and after)
-                    start = max(0, pos - 20)
-                    end = min(len(bundle_data), pos + len(pattern) + 20)
-                    context = bundle_data[start:end]
-                    occurrences.append((pos, context))
-                    pos += 1
-            
-            if occurrences:
-                for occ_pos, context in occurrences[:1]:
-                    hex_context = ' '.join(f'{b:02x}' for b in context)
-                    print(f"      @ offset {occ_pos}: ...{hex_context}...")
+            # Get surrounding context of the first hit (20 bytes before and after)
+            pos = first_offsets[pattern]
+            start = max(0, pos - 20)
+            end = min(len(bundle_data), pos + len(pattern) + 20)
+            hex_context = bundle_data[start:end].hex(' ')
+            print(f"      @ offset {pos}: ...{hex_context}...")
 
 print("\n" + "=" * 80)
 print("PHASE 3: SEARCHING FOR LX-D01 SPECIFIC PATTERNS")
@@ -107,7 +147,7 @@ lx_patterns = {
 
 for name, pattern_bytes in lx_patterns.items():
     pattern = bytes(pattern_bytes)
-    count = bundle_data.count(pattern)
+    count = count_bytes(bundle(), pattern)
     if count > 0:
         print(f"  {name} {pattern.hex()}: {count} occurrences")
 
@@ -119,32 +159,15 @@ print("=" * 80)
 for dex_file in all_dex_files[:2]:  # Check first 2 DEX files
     print(f"\nScanning {dex_file.name} for write methods...")
     try:
-        d = DEX(dex_file.read_bytes())
-        
-        # Get all classes
-        for cls in d.get_classes():
-            class_name = cls.get_name()
-            
+        # Get all classes (parsed once, then cached on disk)
+        for class_name, methods in load_dex(dex_file)['classes']:
             # Look for classes related to printing/BLE
-            if any(x in class_name.lower() for x in ['print', 'ble', 'write', 'send', 'cmd']):
-                methods = cls.get_methods()
+            if WRITE_CLASS_RE.search(class_name.lower()):
                 if methods:
                     print(f"\n  Class: {class_name}")
-                    for method in methods:
-                        method_name = method.get_name()
-                        if any(x in method_name.lower() for x in ['send', 'write', 'cmd', 'data', 'print']):
+                    for method_name, descriptor in methods:
+                        if WRITE_METHOD_RE.search(method_name.lower()):
                             print(f"    Method: {method_name}")
-                            
-                            # Try to get source code
-                            try:
-                                source = method.get_source()
-                                if source and len(source) < 500:
-                                    lines = source.split('\n')[:5]
-                                    for line in lines:
-                                        if line.strip():
-                                            print(f"      {line[:100]}")
-                            except:
-                                pass
                                 
     except Exception as e:
         print(f"  Error: {e}")
@@ -1,21 +1,35 @@
+import mmap
 import re
 
+KEYWORDS = [b"UUID", b"0000", b"LX-D01", b"CRC", b"checksum", b"xor", b"compress", b"0x5a", b"0x51", b"service", b"characteristic"]
+
+# Regex for printable strings (ASCII)
+# 4 or more characters
+STRING_RE = re.compile(b'[ -~]{4,}')
+# Any keyword at all, so strings without one skip the per-keyword loop
+KEYWORD_RE = re.compile(b'|'.join(map(re.escape, KEYWORDS)))
+
 def extract_strings(filepath):
     with open(filepath, 'rb') as f:
-        content = f.read()
-    
-    # Regex for printable strings (ASCII)
-    # 4 or more characters
-    string_pattern = re.compile(b'[ -~]{4,}')
-    
-    found_strings = string_pattern.findall(content)
-    
-    print(f"Extracted {len(found_strings)} strings from {filepath}")
-    
-    keywords = [b"UUID", b"0000", b"LX-D01", b"CRC", b"checksum", b"xor", b"compress", b"0x5a", b"0x51", b"service", b"characteristic"]
-    
-    for s in found_strings:
-        for k in keywords:
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Stream the strings instead of building a list of all of them; only
+    # the ones containing a keyword are kept.
+    string_count = 0
+    hits = []
+    try:
+        for m in STRING_RE.finditer(content):
+            string_count += 1
+            s = m.group()
+            if KEYWORD_RE.search(s):
+                hits.append(s)
+    finally:
+        content.close()
+
+    print(f"Extracted {string_count} strings from {filepath}")
+
+    for s in hits:
+        for k in KEYWORDS:
             if k in s:
                 try:
                     print(f"Match '{k.decode()}': {s.decode()}")
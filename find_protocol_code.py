@@ -13,13 +13,27 @@ Modes:
 """
 
 import asyncio
+import functools
 import struct
 import zlib
 from dataclasses import dataclass
-from typing import Optional, Callable, List
+from typing import Optional, Callable, Dict
 
+import numpy as np
 from bleak import BleakClient, BleakScanner
-from PIL import Image, ImageOps, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    # Carry-less multiply (PCLMULQDQ) CRC32, same polynomial as zlib.crc32
+    from fastcrc import crc32 as _fastcrc32
+except ImportError:
+    _fastcrc32 = None
+
+try:
+    # libdeflate one-shot compressor, emits the same zlib wrapper format
+    import deflate as _libdeflate
+except ImportError:
+    _libdeflate = None
 
 # ---------------------------------------------------------------------------
 # CONFIGURATION
@@ -30,13 +44,62 @@ WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 DEFAULT_PRINTER_WIDTH = 384
 
+# ATT header bytes in each write, and how many writes may be queued at once
+ATT_WRITE_OVERHEAD = 3
+MAX_IN_FLIGHT_WRITES = 4
+
+# Job length (5A 0B) and trailing CRC32 fields, both little endian
+JOB_LEN = struct.Struct('<H')
+CRC32_LE = struct.Struct('<I')
+
+# --zlib: compression level, and the minimum bytes saved to send compressed
+ZLIB_LEVEL = 6
+ZLIB_MIN_SAVING = 8
+
 # ---------------------------------------------------------------------------
 # HELPERS
 # ---------------------------------------------------------------------------
 
-def crc32(data: bytes) -> int:
-    """Standard CRC32"""
-    return zlib.crc32(data) & 0xFFFFFFFF
+# Standard CRC32 (IEEE 802.3 / zlib), using fastcrc when installed.
+# Pass the previous result as crc to continue a running checksum.
+if _fastcrc32 is not None:
+    def crc32(data: bytes, crc: int = 0) -> int:
+        return _fastcrc32.iso_hdlc(data, initial=crc)
+else:
+    # Already unsigned 32-bit in Python 3, so no wrapper or mask needed
+    crc32 = zlib.crc32
+
+def zlib_compress(data: bytes, level: int) -> bytes:
+    """zlib-format compression, using libdeflate when installed"""
+    if _libdeflate is not None:
+        return _libdeflate.zlib_compress(data, level)
+    return zlib.compress(data, level)
+
+def iter_chunks(parts, size: int):
+    """Yield size-byte chunks across several buffers without concatenating them"""
+    pending = b''
+    for part in parts:
+        view = memoryview(part)
+        if pending:
+            need = size - len(pending)
+            pending += bytes(view[:need])
+            view = view[need:]
+            if len(pending) < size:
+                continue
+            yield pending
+            pending = b''
+        full = len(view) - len(view) % size
+        for i in range(0, full, size):
+            yield view[i:i+size]
+        pending = bytes(view[full:])
+    if pending:
+        yield pending
+
+@functools.lru_cache(maxsize=8)
+def _get_font(name: str, size: int):
+    """Load a TrueType font once per process, falling back to PIL's default"""
+    try: return ImageFont.truetype(name, size)
+    except: return ImageFont.load_default()
 
 @dataclass
 class PrinterStatus:
@@ -56,7 +119,10 @@ class LXD01HeaderTest:
         self.device_name = device_name
         self.printer_width = DEFAULT_PRINTER_WIDTH
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self, timeout: float = 20.0) -> None:
         if self.client and self.client.is_connected: return
@@ -70,39 +136,62 @@ class LXD01HeaderTest:
         if self.client: await self.client.disconnect()
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
 
-    async def _write(self, data: bytes, chunk_size: int = 20) -> None:
+    async def _write_chunks(self, chunks) -> None:
+        """Write chunks without response, keeping up to MAX_IN_FLIGHT_WRITES
+        queued instead of sleeping between them. Writes start in order."""
         if not self.client or not self.client.is_connected: return
-        for i in range(0, len(data), chunk_size):
-            await self.client.write_gatt_char(WRITE_CHAR_UUID, data[i:i+chunk_size], response=False)
-            if i + chunk_size < len(data): await asyncio.sleep(0.015) 
+        credits = asyncio.Semaphore(MAX_IN_FLIGHT_WRITES)
+
+        async def send(chunk):
+            try:
+                await self.client.write_gatt_char(WRITE_CHAR_UUID, chunk, response=False)
+            finally:
+                credits.release()
+
+        async with asyncio.TaskGroup() as tg:
+            for chunk in chunks:
+                await credits.acquire()
+                tg.create_task(send(chunk))
+
+    async def _write(self, data: bytes, chunk_size: Optional[int] = None) -> None:
+        if not self.client or not self.client.is_connected: return
+        chunk_size = chunk_size or self.client.mtu_size - ATT_WRITE_OVERHEAD
+        await self._write_chunks(iter_chunks((data,), chunk_size))
 
     async def _wait_for_ack(self, cmd_id: int, timeout: float = 1.0) -> bool:
-        ack_received = asyncio.Event()
-        def check(data):
-            if len(data) >= 2 and data[0] == 0x5A and data[1] == cmd_id:
-                ack_received.set()
-        self.add_notify_callback(check)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[cmd_id] = fut
         try:
-            await asyncio.wait_for(ack_received.wait(), timeout)
+            await asyncio.wait_for(fut, timeout)
             return True
         except asyncio.TimeoutError:
             return False
         finally:
-            self._notify_callbacks.remove(check)
+            if self._pending.get(cmd_id) is fut: del self._pending[cmd_id]
 
     async def query_status(self) -> PrinterStatus:
         last_resp = None
         def cb(d): nonlocal last_resp; last_resp = d
-        self.add_notify_callback(cb)
+        cb_id = self.add_notify_callback(cb)
         await self._write(bytes([0x5A, 0x01])) 
         await asyncio.sleep(0.5)
-        self._notify_callbacks.remove(cb)
+        self.remove_notify_callback(cb_id)
         if not last_resp: return PrinterStatus(b"")
         bat = last_resp[2] if len(last_resp) > 2 else 0
         return PrinterStatus(last_resp, battery_level=bat)
@@ -116,19 +205,24 @@ class LXD01HeaderTest:
         # 1. Format Bitmap
         if img.width != self.printer_width:
             scale = self.printer_width / img.width
-            img = img.resize((self.printer_width, int(img.height * scale)))
+            # Nearest: the 1-bit threshold below discards any filter smoothing
+            img = img.resize((self.printer_width, int(img.height * scale)), Image.NEAREST)
         
-        img = img.convert("L")
-        img = ImageOps.invert(img) # Black->1
-        img = img.convert("1")
-        payload_data = img.tobytes()
+        # Threshold and pack in one NumPy pass: dark pixels -> 1, MSB first
+        gray = np.asarray(img.convert("L"), dtype=np.uint8)
+        payload_data = np.packbits(gray < 128, axis=1).tobytes()
         
         print(f"Raw Bitmap Size: {len(payload_data)} bytes")
 
         if use_zlib:
             print("Applying ZLIB Compression...")
-            payload_data = zlib.compress(payload_data)
-            print(f"Compressed Size: {len(payload_data)} bytes")
+            compressed = zlib_compress(payload_data, ZLIB_LEVEL)
+            print(f"Compressed Size: {len(compressed)} bytes")
+            # Tiny or noisy bitmaps can grow under deflate's header/trailer
+            if len(compressed) < len(payload_data) - ZLIB_MIN_SAVING:
+                payload_data = compressed
+            else:
+                print("Compression doesn't pay off, sending raw bitmap")
 
         # 2. CONSTRUCT STREAM WITH MAGIC HEADER
         # PlatformIO user mentioned "17 bytes offset".
@@ -136,8 +230,9 @@ class LXD01HeaderTest:
         # Many printers use 16 bytes of 0x00 as a "Wake/Sync" preamble.
         magic_header = b'\x00' * 16 
         
-        full_stream = magic_header + payload_data
-        print(f"Total Stream (Header + Data): {len(full_stream)} bytes")
+        # Header and data stay separate buffers; the send loop walks both
+        stream_len = len(magic_header) + len(payload_data)
+        print(f"Total Stream (Header + Data): {stream_len} bytes")
 
         # 3. SEND SEQUENCE
         
@@ -147,8 +242,8 @@ class LXD01HeaderTest:
         
         # B. Set Job Length
         # Length = Stream + 4 (CRC32)
-        total_len = len(full_stream) + 4
-        len_seq = struct.pack('<H', total_len) # Little Endian
+        total_len = stream_len + 4
+        len_seq = JOB_LEN.pack(total_len) # Little Endian
         
         print(f"Sending Length: 0x{len_seq.hex().upper()} (Little Endian)")
         await self._write(b'\x5A\x0B' + len_seq)
@@ -159,17 +254,25 @@ class LXD01HeaderTest:
             print("❌ No ACK for Length.")
 
         # C. Send Stream
-        chunk_s = 100
-        for i in range(0, len(full_stream), chunk_s):
-            await self._write(full_stream[i:i+chunk_s], chunk_size=chunk_s)
-            if (i // chunk_s) % 10 == 0: print(".", end="", flush=True)
-            await asyncio.sleep(0.01)
-        print("")
+        # MTU-sized chunks are pipelined; the CRC is accumulated over each
+        # chunk as it is queued
+        chunk_s = self.client.mtu_size - ATT_WRITE_OVERHEAD
+        crc_val = 0
+        chunk_count = 0
+
+        def stream_chunks():
+            nonlocal crc_val, chunk_count
+            for chunk in iter_chunks((magic_header, payload_data), chunk_s):
+                crc_val = crc32(chunk, crc_val)
+                chunk_count += 1
+                yield chunk
+
+        await self._write_chunks(stream_chunks())
+        print(f"Sent {chunk_count} chunks ({stream_len} bytes)")
         
         # D. Send CRC32 (Little Endian)
-        # Calculate CRC over the WHOLE stream (Header + Data)
-        crc_val = crc32(full_stream)
-        crc_seq = struct.pack('<I', crc_val) 
+        # CRC covers the WHOLE stream (Header + Data)
+        crc_seq = CRC32_LE.pack(crc_val) 
         print(f"Sending CRC32: 0x{crc_seq.hex().upper()}")
         await self._write(crc_seq)
         
@@ -188,8 +291,7 @@ class LXD01HeaderTest:
         print("Done.")
 
     def generate_test_text(self, text: str) -> Image.Image:
-        try: font = ImageFont.truetype("arial.ttf", 100)
-        except: font = ImageFont.load_default()
+        font = _get_font("arial.ttf", 100)
         img = Image.new("1", (384, 150), 1) 
         draw = ImageDraw.Draw(img)
         draw.text((10, 10), text, font=font, fill=0)
@@ -1,60 +1,144 @@
+import itertools
+import mmap
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
-def search_files(directory):
-    uuid_pattern = re.compile(b'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
-    # Search for strings that might indicate the magic bytes or checksums
-    # We search for byte sequences that represent the ASCII strings, or just the strings if they are in code
-    text_patterns = [
-        (b'UUID', "UUID"),
-        (b'service', "service"),
-        (b'characteristic', "characteristic"),
-        (b'CRC', "CRC"),
-        (b'checksum', "checksum"),
-        (b'xor', "xor"),
-        (b'compress', "compress"),
-        (b'bitmap', "bitmap"),
-        (b'0x5a', "0x5a"),
-        (b'0x51', "0x51"),
-        (b'LX-D01', "LX-D01"),
-    ]
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+UUID_RE = re.compile(b'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+# Search for strings that might indicate the magic bytes or checksums
+# We search for byte sequences that represent the ASCII strings, or just the strings if they are in code
+TEXT_PATTERNS = [
+    (b'UUID', "UUID"),
+    (b'service', "service"),
+    (b'characteristic', "characteristic"),
+    (b'CRC', "CRC"),
+    (b'checksum', "checksum"),
+    (b'xor', "xor"),
+    (b'compress', "compress"),
+    (b'bitmap', "bitmap"),
+    (b'0x5a', "0x5a"),
+    (b'0x51', "0x51"),
+    (b'LX-D01', "LX-D01"),
+]
+
+# Files are fed to the automaton in windows of this size rather than
+# decoded whole
+SCAN_CHUNK_SIZE = 16 << 20
+
+# Only this many matches of a pattern are located; a file with this many or
+# more just reports the pattern as present.
+MAX_CONTEXT_MATCHES = 10
+
+def build_automaton(text_patterns):
+    """One Aho-Corasick automaton over all text patterns (latin-1 keeps byte offsets)"""
+    automaton = ahocorasick.Automaton()
+    for index, (pattern, label) in enumerate(text_patterns):
+        automaton.add_word(pattern.decode('latin-1'), index)
+    automaton.make_automaton()
+    return automaton
+
+_automaton = None
+
+def get_automaton():
+    """Build the automaton once per (worker) process"""
+    global _automaton
+    if _automaton is None and ahocorasick:
+        _automaton = build_automaton(TEXT_PATTERNS)
+    return _automaton
+
+def find_pattern_offsets(content, text_patterns, automaton):
+    """Map pattern index -> offsets of its first MAX_CONTEXT_MATCHES matches"""
+    offsets = {}
+    if automaton is None:
+        # No pyahocorasick: one regex pass per pattern
+        for index, (pattern, label) in enumerate(text_patterns):
+            found = [m.start() for m in itertools.islice(re.finditer(re.escape(pattern), content), MAX_CONTEXT_MATCHES)]
+            if found:
+                offsets[index] = found
+        return offsets
+
+    # Each window starts the longest pattern minus one byte before its chunk,
+    # so matches straddling a boundary are found; ones ending in that overlap
+    # were already reported by the previous window
+    overlap = max(len(pattern) for pattern, label in text_patterns) - 1
+    for base in range(0, len(content), SCAN_CHUNK_SIZE):
+        window_start = max(0, base - overlap)
+        skip = base - window_start
+        window = content[window_start:base + SCAN_CHUNK_SIZE]
+        for end_idx, index in automaton.iter(window.decode('latin-1')):
+            if end_idx < skip:
+                continue
+            found = offsets.setdefault(index, [])
+            if len(found) < MAX_CONTEXT_MATCHES:
+                found.append(window_start + end_idx - len(text_patterns[index][0]) + 1)
+    return offsets
 
+def may_contain_uuid(content):
+    """A UUID has 4 hyphens; find() is a memchr, much cheaper than the UUID regex"""
+    pos = -1
+    for _ in range(4):
+        pos = content.find(b'-', pos + 1)
+        if pos < 0:
+            return False
+    return True
+
+def scan_file(filepath):
+    """Scan one file; returns its report lines so workers don't interleave prints"""
+    lines = []
+    try:
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return lines  # mmap cannot map an empty file
+            # Map the file rather than reading it into memory; the
+            # regexes and slicing below work on the mmap directly
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with content:
+            # Search for UUIDs, skipping the regex when there can't be any
+            uuids = UUID_RE.findall(content) if may_contain_uuid(content) else []
+            if uuids:
+                lines.append(f"Found UUIDs in {filepath}:")
+                for uuid in set(uuids):
+                    lines.append(f"  {uuid.decode('utf-8', errors='ignore')}")
+            
+            # Search for other text patterns, all located in one pass
+            pattern_offsets = find_pattern_offsets(content, TEXT_PATTERNS, get_automaton())
+            for index, (pattern, label) in enumerate(TEXT_PATTERNS):
+                if index in pattern_offsets:
+                    # Try to find context? It's binary, so context is hard.
+                    # Just report presence for now.
+                    lines.append(f"Found '{label}' in {filepath}")
+                    
+                    # If it's a small number of matches, maybe print context?
+                    # Let's try to print a bit of context if it looks like text
+                    matches = pattern_offsets[index]
+                    if len(matches) < MAX_CONTEXT_MATCHES:
+                        for m in matches:
+                            start = max(0, m - 20)
+                            end = min(len(content), m + len(pattern) + 20)
+                            snippet = content[start:end]
+                            lines.append(f"    Context: {snippet}")
+
+    except Exception as e:
+        lines.append(f"Could not read {filepath}: {e}")
+    return lines
+
+def search_files(directory):
+    filepaths = []
     for root, dirs, files in os.walk(directory):
         for file in files:
-            filepath = os.path.join(root, file)
-            try:
-                with open(filepath, 'rb') as f:
-                    content = f.read()
-                    
-                    # Search for UUIDs
-                    uuids = uuid_pattern.findall(content)
-                    if uuids:
-                        print(f"Found UUIDs in {filepath}:")
-                        for uuid in set(uuids):
-                            print(f"  {uuid.decode('utf-8', errors='ignore')}")
-                    
-                    # Search for other text patterns
-                    for pattern, label in text_patterns:
-                        if pattern in content:
-                            # Try to find context? It's binary, so context is hard.
-                            # Just report presence for now.
-                            print(f"Found '{label}' in {filepath}")
-                            
-                            # If it's a small number of matches, maybe print context?
-                            # Let's try to print a bit of context if it looks like text
-                            matches = [m.start() for m in re.finditer(re.escape(pattern), content)]
-                            if len(matches) < 10:
-                                for m in matches:
-                                    start = max(0, m - 20)
-                                    end = min(len(content), m + len(pattern) + 20)
-                                    snippet = content[start:end]
-                                    try:
-                                        print(f"    Context: {snippet}")
-                                    except:
-                                        pass
-
-            except Exception as e:
-                print(f"Could not read {filepath}: {e}")
+            filepaths.append(os.path.join(root, file))
+
+    # Files are independent, so scan them on a process pool; map() keeps
+    # the reports in walk order
+    with ProcessPoolExecutor() as executor:
+        for lines in executor.map(scan_file, filepaths, chunksize=8):
+            for line in lines:
+                print(line)
 
 if __name__ == "__main__":
     search_files(r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk")
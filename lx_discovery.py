@@ -12,7 +12,7 @@ Systematically tests the "Missing Commands" hypothesis:
 import asyncio
 import struct
 from dataclasses import dataclass
-from typing import Optional, Callable, List
+from typing import Optional, Callable, Dict
 
 from bleak import BleakClient, BleakScanner
 
@@ -24,6 +24,9 @@ SERVICE_UUID = "0000FFE6-0000-1000-8000-00805f9b34fb"
 WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 
+# Command header: 5A, cmd byte, little-endian payload length
+CMD_HEADER = struct.Struct('<BBH')
+
 # ---------------------------------------------------------------------------
 # DRIVER
 # ---------------------------------------------------------------------------
@@ -33,7 +36,10 @@ class LXD01Discovery:
         self.mac_address = mac_address
         self.device_name = device_name
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self, timeout: float = 20.0) -> None:
         if self.client and self.client.is_connected: return
@@ -42,11 +48,10 @@ class LXD01Discovery:
         if self.mac_address:
             device = await BleakScanner.find_device_by_address(self.mac_address, timeout=timeout)
         else:
-            devices = await BleakScanner.discover(timeout=timeout)
-            for d in devices:
-                if d.name and self.device_name in d.name:
-                    device = d
-                    break
+            # Returns as soon as a matching advertisement arrives instead of
+            # always scanning for the full timeout
+            device = await BleakScanner.find_device_by_filter(
+                lambda d, _adv: bool(d.name and self.device_name in d.name), timeout=timeout)
         
         if not device: raise RuntimeError(f"{self.device_name} not found")
         
@@ -62,11 +67,24 @@ class LXD01Discovery:
             self.client = None
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+            # Also catch generic status responses (0x02) while a test is waiting
+            elif data[1] == 0x02 and self._pending:
+                print(f"   (Status Update: {data.hex().upper()})")
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
 
     async def _write(self, data: bytes) -> None:
         if not self.client or not self.client.is_connected: return
@@ -83,29 +101,17 @@ class LXD01Discovery:
         # 1. Build Packet
         length = len(payload)
         # Little Endian Length
-        pkt = bytes([0x5A, cmd_byte, length & 0xFF, (length >> 8) & 0xFF]) + payload
+        pkt = CMD_HEADER.pack(0x5A, cmd_byte, length) + payload
         
         print(f"   TX: {pkt.hex().upper()}")
         
-        # 2. Listen for ACK
-        ack_event = asyncio.Event()
-        response_data = None
-        
-        def listener(data):
-            nonlocal response_data
-            # Filter for 5A <CmdByte>
-            if len(data) >= 2 and data[0] == 0x5A and data[1] == cmd_byte:
-                response_data = data
-                ack_event.set()
-            # Also catch generic status responses (0x02) that might trigger
-            elif len(data) >= 2 and data[0] == 0x5A and data[1] == 0x02:
-                print(f"   (Status Update: {data.hex().upper()})")
-
-        self.add_notify_callback(listener)
+        # 2. Listen for ACK (5A <CmdByte>)
+        ack = asyncio.get_running_loop().create_future()
+        self._pending[cmd_byte] = ack
         await self._write(pkt)
         
         try:
-            await asyncio.wait_for(ack_event.wait(), timeout=2.0)
+            response_data = await asyncio.wait_for(ack, timeout=2.0)
             print(f"   ✅ ACK RECEIVED: {response_data.hex().upper()}")
             
             # Analyze Response
@@ -119,7 +125,7 @@ class LXD01Discovery:
             print(f"   ❌ NO RESPONSE (Timeout)")
             return False
         finally:
-            self.remove_notify_callback(listener)
+            if self._pending.get(cmd_byte) is ack: del self._pending[cmd_byte]
 
 async def main():
     discovery = LXD01Discovery()
@@ -8,19 +8,30 @@ This script tests different values/endianness for Spacing and Speed.
 """
 
 import asyncio
-from typing import Optional, Callable, List
+import struct
+from typing import Optional, Callable, Dict
 from bleak import BleakClient, BleakScanner
 
 SERVICE_UUID = "0000FFE6-0000-1000-8000-00805f9b34fb"
 WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 
+# Command header: 5A, cmd byte, little-endian payload length
+CMD_HEADER = struct.Struct('<BBH')
+
+def build_cmd(cmd: int, payload: bytes) -> bytes:
+    """[5A] [Cmd] [LenL] [LenH] [Payload]"""
+    return CMD_HEADER.pack(0x5A, cmd, len(payload)) + payload
+
 class LXD01Tuner:
     def __init__(self, mac_address: Optional[str] = None, device_name: str = "LX-D01"):
         self.mac_address = mac_address
         self.device_name = device_name
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self) -> None:
         if self.client and self.client.is_connected: return
@@ -34,32 +45,41 @@ class LXD01Tuner:
         if self.client: await self.client.disconnect()
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
 
     async def _write(self, data: bytes) -> None:
         if self.client: await self.client.write_gatt_char(WRITE_CHAR_UUID, data, response=False)
 
     async def send_cmd(self, cmd: int, payload: bytes) -> bool:
-        length = len(payload)
-        pkt = bytes([0x5A, cmd, length & 0xFF, (length >> 8) & 0xFF]) + payload
-        
-        ack = asyncio.Event()
-        def cb(d):
-            if len(d) >= 2 and d[0] == 0x5A and d[1] == cmd: ack.set()
-        
-        self.add_notify_callback(cb)
+        return await self.send_packet(build_cmd(cmd, payload))
+
+    async def send_packet(self, pkt: bytes) -> bool:
+        """Send a prebuilt command packet and wait for its [5A] [Cmd] echo"""
+        cmd = pkt[1]
+        ack = asyncio.get_running_loop().create_future()
+        self._pending[cmd] = ack
         await self._write(pkt)
         try:
-            await asyncio.wait_for(ack.wait(), 0.5)
+            await asyncio.wait_for(ack, 0.5)
             return True
         except:
             return False
         finally:
-            self.remove_notify_callback(cb)
+            if self._pending.get(cmd) is ack: del self._pending[cmd]
 
 async def main():
     tuner = LXD01Tuner()
@@ -85,36 +105,46 @@ async def main():
         ("Max Spacing",b'\x02\x00', b'\xFF\x00'), # Max spacing byte
     ]
 
-    for name, speed_bytes, space_bytes in configs:
+    # None of the packets change between runs, so build them all up front
+    energy_pkt = build_cmd(0xAF, b'\xFF\xFF')
+    feed_le_pkt = build_cmd(0xA9, b'\x64\x00')
+    feed_be_pkt = build_cmd(0xA9, b'\x01\x00') # 0x0100 BE = 256
+    execute_pkt = build_cmd(0x0E, b'')
+    config_packets = [
+        (name, speed_bytes, space_bytes, build_cmd(0xA4, speed_bytes), build_cmd(0xA7, space_bytes))
+        for name, speed_bytes, space_bytes in configs
+    ]
+
+    for name, speed_bytes, space_bytes, speed_pkt, space_pkt in config_packets:
         print(f"\n[TEST] Config: {name}")
         
         # A. Set Energy (Always Max)
-        await tuner.send_cmd(0xAF, b'\xFF\xFF')
+        await tuner.send_packet(energy_pkt)
         
         # B. Set Speed (0xA4)
         print(f"   Setting Speed (0xA4): {speed_bytes.hex().upper()}")
-        await tuner.send_cmd(0xA4, speed_bytes)
+        await tuner.send_packet(speed_pkt)
         
         # C. Set Spacing (0xA7)
         print(f"   Setting Spacing (0xA7): {space_bytes.hex().upper()}")
-        await tuner.send_cmd(0xA7, space_bytes)
+        await tuner.send_packet(space_pkt)
         
         # D. Send Feed (0xA9) - Try a LONG feed (0x0100 = 256 steps)
         # We try LE first (00 01) then BE (01 00)
         
         # Feed LE
         print("   👉 Triggering Feed (0xA9) [100 steps LE]...")
-        await tuner.send_cmd(0xA9, b'\x64\x00')
+        await tuner.send_packet(feed_le_pkt)
         await asyncio.sleep(1.0)
         
         # Feed BE
         print("   👉 Triggering Feed (0xA9) [256 steps BE]...")
-        await tuner.send_cmd(0xA9, b'\x01\x00') # 0x0100 BE = 256
+        await tuner.send_packet(feed_be_pkt)
         await asyncio.sleep(1.0)
         
         # E. Try EXECUTE (0x0E) just in case Feed needs a trigger
         print("   👉 Sending Execute (0x0E)...")
-        await tuner.send_cmd(0x0E, b'')
+        await tuner.send_packet(execute_pkt)
         await asyncio.sleep(1.0)
 
     print("\n--- FINISHED ---")
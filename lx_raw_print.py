@@ -16,7 +16,7 @@ Sequence:
 import asyncio
 import struct
 import zlib
-from typing import Optional, Callable, List
+from typing import Optional, Callable, Dict
 from bleak import BleakClient, BleakScanner
 
 # ---------------------------------------------------------------------------
@@ -27,9 +27,26 @@ SERVICE_UUID = "0000FFE6-0000-1000-8000-00805f9b34fb"
 WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 
+# Command header: 5A, cmd byte, little-endian payload length
+CMD_HEADER = struct.Struct('<BBH')
+
+# ATT header bytes in each write, and how many writes may be queued at once
+ATT_WRITE_OVERHEAD = 3
+MAX_IN_FLIGHT_WRITES = 4
+
 PRINT_WIDTH = 384
 PRINT_HEIGHT = 400 # Print ~5cm of black
 
+# Start Job (0xA1) payload: width, height, 0; and the trailing CRC32
+START_JOB = struct.Struct('<HHH')
+CRC32_LE = struct.Struct('<I')
+
+# CRC32 of the all-0xFF test pattern per (width, height), worked out ahead of
+# time since the pattern never changes. Other sizes are computed at runtime.
+SOLID_BLACK_CRC32 = {
+    (384, 400): 0xB68B55DD,
+}
+
 # ---------------------------------------------------------------------------
 # DRIVER
 # ---------------------------------------------------------------------------
@@ -39,7 +56,10 @@ class LXD01Raw:
         self.mac_address = mac_address
         self.device_name = device_name
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self, timeout: float = 20.0) -> None:
         if self.client and self.client.is_connected: return
@@ -48,11 +68,10 @@ class LXD01Raw:
         if self.mac_address:
             device = await BleakScanner.find_device_by_address(self.mac_address, timeout=timeout)
         else:
-            devices = await BleakScanner.discover(timeout=timeout)
-            for d in devices:
-                if d.name and self.device_name in d.name:
-                    device = d
-                    break
+            # Returns as soon as a matching advertisement arrives instead of
+            # always scanning for the full timeout
+            device = await BleakScanner.find_device_by_filter(
+                lambda d, _adv: bool(d.name and self.device_name in d.name), timeout=timeout)
         
         if not device: raise RuntimeError(f"{self.device_name} not found")
         
@@ -62,43 +81,66 @@ class LXD01Raw:
 
     async def disconnect(self) -> None:
         if self.client:
-            try: await self.client.stop_notify(NOTIFY_CHAR_UUID)
-            except: pass
+            # Notifications only need stopping on a live link
+            if self.client.is_connected:
+                await self.client.stop_notify(NOTIFY_CHAR_UUID)
             await self.client.disconnect()
             self.client = None
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
+
+    async def _write(self, data: bytes, chunk_size: Optional[int] = None) -> None:
+        if not self.client or not self.client.is_connected: return
+        chunk_size = chunk_size or self.client.mtu_size - ATT_WRITE_OVERHEAD
+        view = memoryview(data)  # slices are views, not copies
+        await self._write_chunks(view[i:i+chunk_size] for i in range(0, len(view), chunk_size))
 
-    async def _write(self, data: bytes, chunk_size: int = 20) -> None:
+    async def _write_chunks(self, chunks) -> None:
+        """Write chunks without response, keeping up to MAX_IN_FLIGHT_WRITES
+        queued instead of sleeping between them. Writes start in order."""
         if not self.client or not self.client.is_connected: return
-        for i in range(0, len(data), chunk_size):
-            await self.client.write_gatt_char(WRITE_CHAR_UUID, data[i:i+chunk_size], response=False)
-            # Flow control: Slightly faster for raw data
-            if i + chunk_size < len(data): await asyncio.sleep(0.01) 
+        credits = asyncio.Semaphore(MAX_IN_FLIGHT_WRITES)
+
+        async def send(chunk):
+            try:
+                await self.client.write_gatt_char(WRITE_CHAR_UUID, chunk, response=False)
+            finally:
+                credits.release()
+
+        async with asyncio.TaskGroup() as tg:
+            for chunk in chunks:
+                await credits.acquire()
+                tg.create_task(send(chunk))
 
     async def wait_for_ack(self, cmd_byte: int, timeout: float = 2.0) -> bool:
-        ack_event = asyncio.Event()
-        def listener(data):
-            if len(data) >= 2 and data[0] == 0x5A and data[1] == cmd_byte:
-                ack_event.set()
-        
-        self.add_notify_callback(listener)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[cmd_byte] = fut
         try:
-            await asyncio.wait_for(ack_event.wait(), timeout)
+            await asyncio.wait_for(fut, timeout)
             return True
         except asyncio.TimeoutError:
             return False
         finally:
-            self.remove_notify_callback(listener)
+            if self._pending.get(cmd_byte) is fut: del self._pending[cmd_byte]
 
     async def send_command(self, cmd: int, payload: bytes) -> bool:
         length = len(payload)
-        pkt = bytes([0x5A, cmd, length & 0xFF, (length >> 8) & 0xFF]) + payload
+        pkt = CMD_HEADER.pack(0x5A, cmd, length) + payload
         await self._write(pkt)
         return await self.wait_for_ack(cmd)
 
@@ -131,7 +173,7 @@ async def main():
     # Payload: [WidthL] [WidthH] [HeightL] [HeightH] [00] [00]
     # 384 = 0x0180 -> 80 01
     # 400 = 0x0190 -> 90 01
-    payload_a1 = struct.pack('<HHH', PRINT_WIDTH, PRINT_HEIGHT, 0)
+    payload_a1 = START_JOB.pack(PRINT_WIDTH, PRINT_HEIGHT, 0)
     print(f"Sending Start Job (0xA1) Payload: {payload_a1.hex().upper()}")
     
     if await printer.send_command(0xA1, payload_a1):
@@ -142,13 +184,15 @@ async def main():
         return
 
     # 5. Stream Raw Data
-    await printer._write(raw_data, chunk_size=120)
+    await printer._write(raw_data)  # MTU-sized chunks
     print("Data Sent.")
     
     # 6. Send CRC32 (4 bytes)
     # zlib.crc32 is standard
-    crc = zlib.crc32(raw_data) & 0xFFFFFFFF
-    crc_bytes = struct.pack('<I', crc) # Little Endian CRC
+    crc = SOLID_BLACK_CRC32.get((PRINT_WIDTH, PRINT_HEIGHT))
+    if crc is None:
+        crc = zlib.crc32(raw_data)  # unsigned 32-bit already
+    crc_bytes = CRC32_LE.pack(crc) # Little Endian CRC
     print(f"Sending CRC32: {crc_bytes.hex().upper()}")
     await printer._write(crc_bytes)
     await asyncio.sleep(0.1)
@@ -13,19 +13,26 @@ Strategy:
 """
 
 import asyncio
-from typing import Optional, Callable
+import struct
+from typing import Optional, Callable, Dict
 from bleak import BleakClient, BleakScanner
 
 SERVICE_UUID = "0000FFE6-0000-1000-8000-00805f9b34fb"
 WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 
+# Command header: 5A, cmd byte, little-endian payload length
+CMD_HEADER = struct.Struct('<BBH')
+
 class LXD01Smart:
     def __init__(self, mac_address: Optional[str] = None, device_name: str = "LX-D01"):
         self.mac_address = mac_address
         self.device_name = device_name
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self) -> None:
         if self.client and self.client.is_connected: return
@@ -39,39 +46,41 @@ class LXD01Smart:
         if self.client: await self.client.disconnect()
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+            # Capture STATUS updates (0x02) while a command is waiting
+            elif data[1] == 0x02 and self._pending:
+                status_byte = data[2] if len(data) > 2 else 0
+                print(f"   🔔 STATUS UPDATE: {data.hex().upper()} (Flag: 0x{status_byte:02X})")
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
-    def remove_notify_callback(self, cb): 
-        if cb in self._notify_callbacks: self._notify_callbacks.remove(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
 
     async def _write(self, data: bytes) -> None:
         if self.client: await self.client.write_gatt_char(WRITE_CHAR_UUID, data, response=False)
 
     async def send_cmd(self, name: str, cmd: int, payload: bytes) -> bool:
         length = len(payload)
-        pkt = bytes([0x5A, cmd, length & 0xFF, (length >> 8) & 0xFF]) + payload
+        pkt = CMD_HEADER.pack(0x5A, cmd, length) + payload
         
         print(f"👉 SEND: {name} (0x{cmd:02X}) Payload: {payload.hex().upper()}")
         
-        ack = asyncio.Event()
-        resp = None
-        
-        def cb(d):
-            nonlocal resp
-            # Capture command ECHO
-            if len(d) >= 2 and d[0] == 0x5A and d[1] == cmd:
-                resp = d
-                ack.set()
-            # Capture STATUS updates (0x02) separately
-            elif len(d) >= 2 and d[0] == 0x5A and d[1] == 0x02:
-                status_byte = d[2] if len(d) > 2 else 0
-                print(f"   🔔 STATUS UPDATE: {d.hex().upper()} (Flag: 0x{status_byte:02X})")
-
-        self.add_notify_callback(cb)
+        # Capture command ECHO; STATUS updates (0x02) are printed by _handle_notify
+        ack = asyncio.get_running_loop().create_future()
+        self._pending[cmd] = ack
         await self._write(pkt)
         try:
-            await asyncio.wait_for(ack.wait(), 1.0)
+            resp = await asyncio.wait_for(ack, 1.0)
             print(f"   ✅ ACK: {resp.hex().upper()}")
             # Check for error codes in the response payload (usually byte 4)
             if len(resp) > 4 and resp[4] != 0x00:
@@ -81,7 +90,7 @@ class LXD01Smart:
             print(f"   ❌ NO ACK")
             return False
         finally:
-            self.remove_notify_callback(cb)
+            if self._pending.get(cmd) is ack: del self._pending[cmd]
 
 async def main():
     printer = LXD01Smart()
@@ -103,12 +112,16 @@ async def main():
     await asyncio.sleep(0.5)
 
     print("\n--- CONFIGURING MOTOR ---")
-    # Set Spacing (0xA7) - 32 dots
-    await printer.send_cmd("Set Spacing", 0xA7, b'\x20\x00')
-    # Set Speed (0xA4) - High
-    await printer.send_cmd("Set Speed", 0xA4, b'\x02\x00')
-    # Set Energy (0xAF)
-    await printer.send_cmd("Set Energy", 0xAF, b'\xFF\xFF')
+    # Independent settings with distinct ACK bytes, so send all three and
+    # wait for the ACKs together instead of one round trip each
+    await asyncio.gather(
+        # Set Spacing (0xA7) - 32 dots
+        printer.send_cmd("Set Spacing", 0xA7, b'\x20\x00'),
+        # Set Speed (0xA4) - High
+        printer.send_cmd("Set Speed", 0xA4, b'\x02\x00'),
+        # Set Energy (0xAF)
+        printer.send_cmd("Set Energy", 0xAF, b'\xFF\xFF'),
+    )
 
     print("\n--- TRIGGERING FEED ---")
     # Feed (0xA9) - 150 steps
@@ -9,13 +9,22 @@ v16.0 - Line Alignment Fix
 """
 
 import asyncio
+import functools
 import struct
+from array import array
 from dataclasses import dataclass
-from typing import Optional, Callable, List
+from typing import Optional, Callable, Dict
 
+import numpy as np
 from bleak import BleakClient, BleakScanner
 from PIL import Image, ImageOps, ImageDraw, ImageFont
 
+try:
+    # Native CRC-16/XMODEM
+    from fastcrc import crc16 as _fastcrc16
+except ImportError:
+    _fastcrc16 = None
+
 # ---------------------------------------------------------------------------
 # CONFIGURATION
 # ---------------------------------------------------------------------------
@@ -25,22 +34,51 @@ WRITE_CHAR_UUID = "0000FFE1-0000-1000-8000-00805f9b34fb"
 NOTIFY_CHAR_UUID = "0000FFE2-0000-1000-8000-00805f9b34fb"
 DEFAULT_PRINTER_WIDTH = 384
 PAYLOAD_SIZE = 48 # CRITICAL FIX: 48 bytes = 1 line (384 dots)
+# Packet header: 55, lines per packet, little-endian packet index
+PACKET_HEADER = struct.Struct('<BBH')
+PACKET_SIZE = PACKET_HEADER.size + PAYLOAD_SIZE
+# Job length (little endian) and trailing CRC16 (big endian) fields
+JOB_LEN = struct.Struct('<H')
+CRC16_BE = struct.Struct('>H')
+
+# ATT header bytes in each write, and how many writes may be queued at once
+ATT_WRITE_OVERHEAD = 3
+MAX_IN_FLIGHT_WRITES = 4
 
 # ---------------------------------------------------------------------------
 # HELPERS
 # ---------------------------------------------------------------------------
 
-def crc16_xmodem(data: bytes) -> int:
-    """CRC-16-CCITT (XMODEM) polynomial 0x1021"""
-    crc = 0
-    for b in data:
-        crc ^= (b << 8)
+def _crc16_table() -> array:
+    """CRC of each possible top byte, so the bit loop runs once per byte value"""
+    table = array('H')
+    for n in range(256):
+        crc = n << 8
         for _ in range(8):
             if crc & 0x8000:
                 crc = (crc << 1) ^ 0x1021
             else:
                 crc = (crc << 1)
-    return crc & 0xFFFF
+        table.append(crc & 0xFFFF)
+    return table
+
+CRC16_TABLE = _crc16_table()
+
+def crc16_xmodem(data: bytes) -> int:
+    """CRC-16-CCITT (XMODEM) polynomial 0x1021, using fastcrc when installed"""
+    if _fastcrc16 is not None:
+        return _fastcrc16.xmodem(bytes(data))
+    crc = 0
+    table = CRC16_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ b]
+    return crc
+
+@functools.lru_cache(maxsize=8)
+def _get_font(name: str, size: int):
+    """Load a TrueType font once per process, falling back to PIL's default"""
+    try: return ImageFont.truetype(name, size)
+    except: return ImageFont.load_default()
 
 @dataclass
 class PrinterStatus:
@@ -60,7 +98,10 @@ class LXD01Printer:
         self.device_name = device_name
         self.printer_width = DEFAULT_PRINTER_WIDTH
         self.client: Optional[BleakClient] = None
-        self._notify_callbacks: List[Callable[[bytes], None]] = []
+        # Keyed by the id add_notify_callback returns, so removal is O(1)
+        self._notify_callbacks: Dict[int, Callable[[bytes], None]] = {}
+        self._next_cb_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
 
     async def connect(self, timeout: float = 20.0) -> None:
         if self.client and self.client.is_connected: return
@@ -69,11 +110,10 @@ class LXD01Printer:
         if self.mac_address:
             device = await BleakScanner.find_device_by_address(self.mac_address, timeout=timeout)
         else:
-            devices = await BleakScanner.discover(timeout=timeout)
-            for d in devices:
-                if d.name and self.device_name in d.name:
-                    device = d
-                    break
+            # Returns as soon as a matching advertisement arrives instead of
+            # always scanning for the full timeout
+            device = await BleakScanner.find_device_by_filter(
+                lambda d, _adv: bool(d.name and self.device_name in d.name), timeout=timeout)
         
         if not device: raise RuntimeError(f"{self.device_name} not found")
         
@@ -83,43 +123,70 @@ class LXD01Printer:
 
     async def disconnect(self) -> None:
         if self.client:
-            try: await self.client.stop_notify(NOTIFY_CHAR_UUID)
-            except: pass
+            # Notifications only need stopping on a live link
+            if self.client.is_connected:
+                await self.client.stop_notify(NOTIFY_CHAR_UUID)
             await self.client.disconnect()
             self.client = None
 
     def _handle_notify(self, _sender, data: bytearray) -> None:
-        for cb in self._notify_callbacks: cb(bytes(data))
+        # ACK waiters are keyed by command byte: one dict lookup per notify
+        if len(data) >= 2 and data[0] == 0x5A:
+            fut = self._pending.pop(data[1], None)
+            if fut and not fut.done(): fut.set_result(bytes(data))
+        cbs = self._notify_callbacks
+        if not cbs: return
+        msg = bytes(data)  # one copy shared by every callback
+        for cb in cbs.values(): cb(msg)
     
-    def add_notify_callback(self, cb): self._notify_callbacks.append(cb)
+    def add_notify_callback(self, cb) -> int:
+        cb_id = self._next_cb_id
+        self._next_cb_id += 1
+        self._notify_callbacks[cb_id] = cb
+        return cb_id
+    def remove_notify_callback(self, cb_id: int): self._notify_callbacks.pop(cb_id, None)
+
+    async def _write(self, data: bytes, chunk_size: Optional[int] = None) -> None:
+        if not self.client or not self.client.is_connected: return
+        chunk_size = chunk_size or self.client.mtu_size - ATT_WRITE_OVERHEAD
+        view = memoryview(data)  # slices are views, not copies
+        await self._write_chunks(view[i:i+chunk_size] for i in range(0, len(view), chunk_size))
 
-    async def _write(self, data: bytes, chunk_size: int = 20) -> None:
+    async def _write_chunks(self, chunks) -> None:
+        """Write chunks without response, keeping up to MAX_IN_FLIGHT_WRITES
+        queued instead of sleeping between them. Writes start in order."""
         if not self.client or not self.client.is_connected: return
-        for i in range(0, len(data), chunk_size):
-            await self.client.write_gatt_char(WRITE_CHAR_UUID, data[i:i+chunk_size], response=False)
-            if i + chunk_size < len(data): await asyncio.sleep(0.015) 
+        credits = asyncio.Semaphore(MAX_IN_FLIGHT_WRITES)
+
+        async def send(chunk):
+            try:
+                await self.client.write_gatt_char(WRITE_CHAR_UUID, chunk, response=False)
+            finally:
+                credits.release()
+
+        async with asyncio.TaskGroup() as tg:
+            for chunk in chunks:
+                await credits.acquire()
+                tg.create_task(send(chunk))
 
     async def _wait_for_ack(self, cmd_id: int, timeout: float = 1.0) -> bool:
-        ack_received = asyncio.Event()
-        def check(data):
-            if len(data) >= 2 and data[0] == 0x5A and data[1] == cmd_id:
-                ack_received.set()
-        self.add_notify_callback(check)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[cmd_id] = fut
         try:
-            await asyncio.wait_for(ack_received.wait(), timeout)
+            await asyncio.wait_for(fut, timeout)
             return True
         except asyncio.TimeoutError:
             return False
         finally:
-            self._notify_callbacks.remove(check)
+            if self._pending.get(cmd_id) is fut: del self._pending[cmd_id]
 
     async def query_status(self) -> PrinterStatus:
         last_resp = None
         def cb(d): nonlocal last_resp; last_resp = d
-        self.add_notify_callback(cb)
+        cb_id = self.add_notify_callback(cb)
         await self._write(bytes([0x5A, 0x01])) 
         await asyncio.sleep(0.5)
-        self._notify_callbacks.remove(cb)
+        self.remove_notify_callback(cb_id)
         if not last_resp: return PrinterStatus(b"")
         bat = last_resp[2] if len(last_resp) > 2 else 0
         return PrinterStatus(last_resp, battery_level=bat)
@@ -133,18 +200,17 @@ class LXD01Printer:
         # 1. Format Bitmap
         if img.width != self.printer_width:
             scale = self.printer_width / img.width
-            img = img.resize((self.printer_width, int(img.height * scale)))
+            # Nearest: the 1-bit threshold below discards any filter smoothing
+            img = img.resize((self.printer_width, int(img.height * scale)), Image.NEAREST)
         
         img = img.convert("L")
         img = ImageOps.autocontrast(img)
         
-        if invert:
-             img = img.point(lambda v: 0 if v < 128 else 255, mode="1")
-        else:
-             img = ImageOps.invert(img) 
-             img = img.convert("1")
-             
-        raw_bitmap = img.tobytes()
+        # Threshold + pack in one NumPy pass, MSB first: dark pixels -> 1,
+        # or light pixels -> 1 when inverted
+        gray = np.asarray(img, dtype=np.uint8)
+        mask = gray >= 128 if invert else gray < 128
+        raw_bitmap = np.packbits(mask, axis=1).tobytes()
         
         # Align to 48 bytes (1 line)
         if len(raw_bitmap) % PAYLOAD_SIZE != 0:
@@ -154,23 +220,21 @@ class LXD01Printer:
         print(f"Raw Bitmap: {len(raw_bitmap)} bytes")
 
         # 2. CREATE PACKET STREAM
-        packet_stream = bytearray()
+        # The size is known up front, so allocate it once and fill in place
         chunk_count = len(raw_bitmap) // PAYLOAD_SIZE
+        packet_stream = bytearray(chunk_count * PACKET_SIZE)
+        bitmap_view = memoryview(raw_bitmap)
         print(f"Generating {chunk_count} packets (48 bytes payload each)...")
         
         for i in range(chunk_count):
             start = i * PAYLOAD_SIZE
             end = start + PAYLOAD_SIZE
-            payload = raw_bitmap[start:end]
+            off = i * PACKET_SIZE
             
             # Header: 55 [Lines] [IdxL] [IdxH]
             # Try 01 for 1 line
-            idx_l = i & 0xFF
-            idx_h = (i >> 8) & 0xFF
-            header = bytes([0x55, 0x01, idx_l, idx_h])
-            
-            packet_stream.extend(header)
-            packet_stream.extend(payload)
+            PACKET_HEADER.pack_into(packet_stream, off, 0x55, 0x01, i & 0xFFFF)
+            packet_stream[off + PACKET_HEADER.size:off + PACKET_SIZE] = bitmap_view[start:end]
             
         print(f"Total Stream Size: {len(packet_stream)} bytes")
 
@@ -181,7 +245,7 @@ class LXD01Printer:
         
         # B. Set Job Length
         total_len = len(packet_stream) + 2
-        len_seq = struct.pack('<H', total_len) 
+        len_seq = JOB_LEN.pack(total_len) 
         
         print(f"Sending Length: 0x{len_seq.hex().upper()} (Little Endian)")
         await self._write(b'\x5A\x0B' + len_seq)
@@ -192,16 +256,18 @@ class LXD01Printer:
             print("❌ No ACK for Length.")
 
         # C. Send Packets
-        chunk_s = 52 # Send exactly 1 packet (4 header + 48 data) at a time
-        for i in range(0, len(packet_stream), chunk_s):
-            await self._write(packet_stream[i:i+chunk_s], chunk_size=chunk_s)
-            if (i // chunk_s) % 10 == 0: print(".", end="", flush=True)
-            await asyncio.sleep(0.01)
-        print("")
+        # As many whole packets (4 header + 48 data) as fit in one MTU-sized
+        # write, so every write still starts on a packet boundary
+        packets_per_write = max(1, (self.client.mtu_size - ATT_WRITE_OVERHEAD) // PACKET_SIZE)
+        chunk_s = packets_per_write * PACKET_SIZE
+        # Pipelined by write credits rather than a sleep per packet
+        stream_view = memoryview(packet_stream)
+        await self._write_chunks(stream_view[i:i+chunk_s] for i in range(0, len(stream_view), chunk_s))
+        print(f"Sent {chunk_count} packets ({packets_per_write} per write)")
         
         # D. Send CRC16 (XMODEM)
         crc_val = crc16_xmodem(packet_stream)
-        crc_seq = struct.pack('>H', crc_val) 
+        crc_seq = CRC16_BE.pack(crc_val) 
         print(f"Sending CRC16: 0x{crc_seq.hex().upper()}")
         await self._write(crc_seq)
         
@@ -220,8 +286,7 @@ class LXD01Printer:
         print("Done.")
 
     def generate_test_text(self, text: str) -> Image.Image:
-        try: font = ImageFont.truetype("arial.ttf", 100)
-        except: font = ImageFont.load_default()
+        font = _get_font("arial.ttf", 100)
         img = Image.new("1", (384, 150), 1) 
         draw = ImageDraw.Draw(img)
         draw.text((10, 10), text, font=font, fill=0)
@@ -3,12 +3,16 @@
 Parse btsnoop log file to extract BLE ATT Write commands.
 This will help identify the printer protocol bytes.
 """
+import mmap
 import struct
 import sys
+from collections import Counter, defaultdict
 
 # BTSnoop file format constants
 BTSNOOP_HEADER = b'btsnoop\x00'
 BTSNOOP_HEADER_LEN = 16
+# Per-packet record header: original/included length, flags, drops, timestamp
+PKT_HEADER = struct.Struct('>IIIIII')
 
 # HCI packet types
 HCI_CMD = 0x01
@@ -22,6 +26,10 @@ ATT_WRITE_CMD = 0x52        # Write Command (no response)
 ATT_WRITE_RSP = 0x13        # Write Response
 ATT_HANDLE_VALUE_NTF = 0x1B # Handle Value Notification
 
+# Bytes shown in a dump line, and bytes.translate table for the ASCII column
+DUMP_BYTES = 20
+PRINTABLE_ASCII = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
 def parse_btsnoop(filename):
     """Parse btsnoop file and extract ATT packets."""
     
@@ -32,90 +40,68 @@ def parse_btsnoop(filename):
             print(f"Invalid btsnoop header: {header}")
             return
         
+        # Map the file rather than doing two read() calls per packet
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    with mm:
         # Skip rest of header (version, datalink type)
-        f.read(8)
+        off = BTSNOOP_HEADER_LEN
+        end = len(mm)
         
         packet_num = 0
         att_writes = []
         att_notifications = []
         
-        while True:
-            # Read packet header (24 bytes)
-            pkt_header = f.read(24)
-            if len(pkt_header) < 24:
-                break
-            
+        while off + PKT_HEADER.size <= end:
+            # Packet header (24 bytes)
             original_len, included_len, flags, drops, timestamp_hi, timestamp_lo = \
-                struct.unpack('>IIIIII', pkt_header)
+                PKT_HEADER.unpack_from(mm, off)
+            off += PKT_HEADER.size
             
-            # Read packet data
-            pkt_data = f.read(included_len)
-            if len(pkt_data) < included_len:
+            # Packet data: fields are read straight from the mapping, and only
+            # the value of a kept ATT packet is ever copied out
+            if off + included_len > end:
                 break
+            pkt_off = off
+            off += included_len
             
             packet_num += 1
             
-            # Check if it's an ACL packet (BLE data)
-            if len(pkt_data) > 0:
-                hci_type = pkt_data[0]
-                
-                if hci_type == HCI_ACL and len(pkt_data) > 9:
-                    # ACL packet structure:
-                    # 1 byte: HCI type
-                    # 2 bytes: handle + flags
-                    # 2 bytes: data length
-                    # Then L2CAP header (4 bytes): length + CID
-                    # Then ATT data
-                    
-                    acl_handle = struct.unpack('<H', pkt_data[1:3])[0] & 0x0FFF
-                    acl_len = struct.unpack('<H', pkt_data[3:5])[0]
-                    
-                    if len(pkt_data) >= 9:
-                        l2cap_len = struct.unpack('<H', pkt_data[5:7])[0]
-                        l2cap_cid = struct.unpack('<H', pkt_data[7:9])[0]
-                        
-                        # CID 0x0004 is ATT (Attribute Protocol)
-                        if l2cap_cid == 0x0004 and len(pkt_data) > 9:
-                            att_data = pkt_data[9:]
-                            att_opcode = att_data[0]
-                            
-                            direction = "TX" if (flags & 0x01) == 0 else "RX"
-                            
-                            if att_opcode == ATT_WRITE_CMD and len(att_data) >= 3:
-                                # Write Command: opcode (1) + handle (2) + data
-                                handle = struct.unpack('<H', att_data[1:3])[0]
-                                write_data = att_data[3:]
-                                att_writes.append({
-                                    'packet': packet_num,
-                                    'direction': direction,
-                                    'opcode': 'WRITE_CMD',
-                                    'handle': handle,
-                                    'data': write_data
-                                })
-                            
-                            elif att_opcode == ATT_WRITE_REQ and len(att_data) >= 3:
-                                # Write Request: opcode (1) + handle (2) + data
-                                handle = struct.unpack('<H', att_data[1:3])[0]
-                                write_data = att_data[3:]
-                                att_writes.append({
-                                    'packet': packet_num,
-                                    'direction': direction,
-                                    'opcode': 'WRITE_REQ',
-                                    'handle': handle,
-                                    'data': write_data
-                                })
-                            
-                            elif att_opcode == ATT_HANDLE_VALUE_NTF and len(att_data) >= 3:
-                                # Notification: opcode (1) + handle (2) + data
-                                handle = struct.unpack('<H', att_data[1:3])[0]
-                                ntf_data = att_data[3:]
-                                att_notifications.append({
-                                    'packet': packet_num,
-                                    'direction': direction,
-                                    'opcode': 'NOTIFICATION',
-                                    'handle': handle,
-                                    'data': ntf_data
-                                })
+            # ACL packet structure:
+            # 1 byte: HCI type
+            # 2 bytes: handle + flags
+            # 2 bytes: data length
+            # Then L2CAP header (4 bytes): length + CID
+            # Then ATT data: opcode (1) + handle (2) + value
+            #
+            # Only ATT over ACL is of interest, so reject everything else on
+            # the type byte and CID before decoding any other field.
+            if included_len <= 9 or mm[pkt_off] != HCI_ACL:
+                continue
+            
+            # CID 0x0004 is ATT (Attribute Protocol)
+            if mm[pkt_off + 7] | (mm[pkt_off + 8] << 8) != 0x0004:
+                continue
+            
+            att_opcode = mm[pkt_off + 9]
+            if att_opcode == ATT_WRITE_CMD:
+                opcode_name, found = 'WRITE_CMD', att_writes
+            elif att_opcode == ATT_WRITE_REQ:
+                opcode_name, found = 'WRITE_REQ', att_writes
+            elif att_opcode == ATT_HANDLE_VALUE_NTF:
+                opcode_name, found = 'NOTIFICATION', att_notifications
+            else:
+                continue
+            if included_len < 12:
+                continue
+            
+            found.append({
+                'packet': packet_num,
+                'direction': "TX" if (flags & 0x01) == 0 else "RX",
+                'opcode': opcode_name,
+                'handle': mm[pkt_off + 10] | (mm[pkt_off + 11] << 8),
+                'data': mm[pkt_off + 12:off]
+            })
         
         print(f"=" * 80)
         print(f"BTSNOOP ANALYSIS RESULTS")
@@ -132,20 +118,17 @@ def parse_btsnoop(filename):
             print(f"=" * 80)
             
             # Group by handle
-            handles = {}
+            handles = defaultdict(list)
             for w in att_writes:
-                h = w['handle']
-                if h not in handles:
-                    handles[h] = []
-                handles[h].append(w)
+                handles[w['handle']].append(w)
             
             for handle, writes in sorted(handles.items()):
                 print(f"\n--- Handle 0x{handle:04X} ({len(writes)} writes) ---")
                 for i, w in enumerate(writes[:20]):  # Show first 20
-                    hex_data = ' '.join(f'{b:02X}' for b in w['data'])
-                    ascii_data = ''.join(chr(b) if 32 <= b < 127 else '.' for b in w['data'])
-                    print(f"  [{w['packet']:5d}] {w['direction']} {w['opcode']:10s}: {hex_data[:60]}{'...' if len(hex_data) > 60 else ''}")
-                    if len(w['data']) <= 20:
+                    hex_data = w['data'][:DUMP_BYTES].hex(' ').upper()
+                    print(f"  [{w['packet']:5d}] {w['direction']} {w['opcode']:10s}: {hex_data}{' ...' if len(w['data']) > DUMP_BYTES else ''}")
+                    if len(w['data']) <= DUMP_BYTES:
+                        ascii_data = w['data'].translate(PRINTABLE_ASCII).decode('ascii')
                         print(f"           ASCII: {ascii_data}")
                 
                 if len(writes) > 20:
@@ -158,18 +141,15 @@ def parse_btsnoop(filename):
             print(f"=" * 80)
             
             # Group by handle
-            handles = {}
+            handles = defaultdict(list)
             for n in att_notifications:
-                h = n['handle']
-                if h not in handles:
-                    handles[h] = []
-                handles[h].append(n)
+                handles[n['handle']].append(n)
             
             for handle, ntfs in sorted(handles.items()):
                 print(f"\n--- Handle 0x{handle:04X} ({len(ntfs)} notifications) ---")
                 for i, n in enumerate(ntfs[:10]):  # Show first 10
-                    hex_data = ' '.join(f'{b:02X}' for b in n['data'])
-                    print(f"  [{n['packet']:5d}] {n['direction']} {n['opcode']:12s}: {hex_data[:60]}{'...' if len(hex_data) > 60 else ''}")
+                    hex_data = n['data'][:DUMP_BYTES].hex(' ').upper()
+                    print(f"  [{n['packet']:5d}] {n['direction']} {n['opcode']:12s}: {hex_data}{' ...' if len(n['data']) > DUMP_BYTES else ''}")
                 
                 if len(ntfs) > 10:
                     print(f"  ... and {len(ntfs) - 10} more notifications")
@@ -181,26 +161,15 @@ def parse_btsnoop(filename):
         
         if att_writes:
             # Find unique starting bytes
-            start_bytes = {}
-            for w in att_writes:
-                if len(w['data']) > 0:
-                    start = w['data'][0]
-                    if start not in start_bytes:
-                        start_bytes[start] = 0
-                    start_bytes[start] += 1
+            start_bytes = Counter(w['data'][0] for w in att_writes if w['data'])
             
             print("\nCommon starting bytes in write data:")
-            for byte, count in sorted(start_bytes.items(), key=lambda x: -x[1])[:10]:
+            for byte, count in start_bytes.most_common(10):
                 print(f"  0x{byte:02X} ({byte:3d}): {count} occurrences")
             
             # Find data length distribution
             print("\nWrite data length distribution:")
-            lengths = {}
-            for w in att_writes:
-                l = len(w['data'])
-                if l not in lengths:
-                    lengths[l] = 0
-                lengths[l] += 1
+            lengths = Counter(len(w['data']) for w in att_writes)
             
             for length, count in sorted(lengths.items())[:15]:
                 print(f"  {length:4d} bytes: {count} writes")
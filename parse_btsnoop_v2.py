@@ -2,10 +2,125 @@
 """
 Comprehensive btsnoop log parser - inspect all packet types.
 """
+import contextlib
+import io
+import mmap
 import struct
 import sys
+from collections import Counter
+
+import numpy as np
 
 BTSNOOP_HEADER = b'btsnoop\x00'
+BTSNOOP_HEADER_LEN = 16
+# Per-packet record header: original/included length, flags, drops, timestamp
+PKT_HEADER = struct.Struct('>IIIIII')
+
+# Numba is optional: with it the record walk runs as native code, without it
+# we fall back to the plain struct loop.
+try:
+    from numba import njit, types
+except ImportError:
+    njit = None
+
+if njit is not None:
+    # Explicit signature: compiled (or loaded from cache) at import rather
+    # than on the first call. buf is a read-only view of the mmap.
+    _I64_ARRAY = types.int64[::1]
+    
+    @njit(types.int64(types.Array(types.uint8, 1, 'C', readonly=True), types.int64,
+                      types.int64, _I64_ARRAY, _I64_ARRAY, _I64_ARRAY), cache=True)
+    def _walk_records_jit(buf, start, hdr_size, offsets, lengths, flags):
+        n = 0
+        off = start
+        end = buf.size
+        while off + hdr_size <= end:
+            # Big endian included_len and flags, fields 2 and 3 of the header
+            included_len = 0
+            pkt_flags = 0
+            for k in range(4):
+                included_len = (included_len << 8) | np.int64(buf[off + 4 + k])
+                pkt_flags = (pkt_flags << 8) | np.int64(buf[off + 8 + k])
+            off += hdr_size
+            if off + included_len > end:
+                break
+            offsets[n] = off
+            lengths[n] = included_len
+            flags[n] = pkt_flags
+            n += 1
+            off += included_len
+        return n
+
+def walk_records(mm, buf):
+    """(data offset, included length, flags) arrays for every complete record"""
+    if njit is not None:
+        # Every record is at least a header, which bounds the packet count,
+        # so the kernel fills arrays allocated once here and never grows them
+        cap = max(0, (len(buf) - BTSNOOP_HEADER_LEN) // PKT_HEADER.size)
+        offsets = np.empty(cap, dtype=np.int64)
+        lengths = np.empty(cap, dtype=np.int64)
+        flags = np.empty(cap, dtype=np.int64)
+        n = _walk_records_jit(buf, BTSNOOP_HEADER_LEN, PKT_HEADER.size, offsets, lengths, flags)
+        return offsets[:n], lengths[:n], flags[:n]
+    
+    offsets, lengths, flags = [], [], []
+    off = BTSNOOP_HEADER_LEN
+    end = len(mm)
+    while off + PKT_HEADER.size <= end:
+        _, included_len, pkt_flags, _, _, _ = PKT_HEADER.unpack_from(mm, off)
+        off += PKT_HEADER.size
+        if off + included_len > end:
+            break
+        offsets.append(off)
+        lengths.append(included_len)
+        flags.append(pkt_flags)
+        off += included_len
+    return (np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64),
+            np.array(flags, dtype=np.int64))
+
+def scan_records(mm):
+    """
+    One pass over the mapped log, returning per-packet arrays:
+    (data offset, included length, flags, HCI type, L2CAP CID, ATT opcode,
+    ATT handle, first byte of the ATT value), with -1 where a packet is too
+    short to have the field. Only the record
+    walk is a loop; the fields are gathered for all packets at once.
+    """
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    offsets, lengths, flags = walk_records(mm, buf)
+    
+    hci_types = np.full(len(offsets), -1, dtype=np.int64)
+    has_type = lengths > 0
+    hci_types[has_type] = buf[offsets[has_type]]
+    
+    # ACL: type(1) + handle(2) + len(2) + L2CAP: len(2) + CID(2)
+    cids = np.full(len(offsets), -1, dtype=np.int64)
+    has_cid = (hci_types == 0x02) & (lengths >= 9)
+    cid_offsets = offsets[has_cid]
+    cids[has_cid] = buf[cid_offsets + 7] | (buf[cid_offsets + 8].astype(np.int64) << 8)
+    
+    att_opcodes = np.full(len(offsets), -1, dtype=np.int64)
+    has_opcode = (cids == 0x0004) & (lengths > 9)
+    att_opcodes[has_opcode] = buf[offsets[has_opcode] + 9]
+    
+    # ATT PDU: opcode(1) + handle(2) + value
+    att_handles = np.full(len(offsets), -1, dtype=np.int64)
+    has_handle = has_opcode & (lengths >= 12)
+    handle_offsets = offsets[has_handle]
+    att_handles[has_handle] = buf[handle_offsets + 10] | (buf[handle_offsets + 11].astype(np.int64) << 8)
+    
+    att_first_bytes = np.full(len(offsets), -1, dtype=np.int64)
+    has_value = has_opcode & (lengths > 12)
+    att_first_bytes[has_value] = buf[offsets[has_value] + 12]
+    
+    return offsets, lengths, flags, hci_types, cids, att_opcodes, att_handles, att_first_bytes
+
+def count_values(values):
+    """Sorted (value, count) pairs for the non-negative entries of values"""
+    # Types and opcodes are bytes and CIDs 16-bit, so a bincount table is small
+    counts = np.bincount(values[values >= 0])
+    present = np.flatnonzero(counts)
+    return zip(present.tolist(), counts[present].tolist())
 
 def parse_btsnoop_all(filename):
     """Parse btsnoop file and show all packet types."""
@@ -22,43 +137,15 @@ def parse_btsnoop_all(filename):
         print(f"BTSnoop version: {version}, datalink type: {datalink}")
         print()
         
-        packet_num = 0
-        packet_types = {}
-        acl_packets = []
-        
-        while True:
-            # Read packet header (24 bytes)
-            pkt_header = f.read(24)
-            if len(pkt_header) < 24:
-                break
-            
-            original_len, included_len, flags, drops, timestamp_hi, timestamp_lo = \
-                struct.unpack('>IIIIII', pkt_header)
-            
-            # Read packet data
-            pkt_data = f.read(included_len)
-            if len(pkt_data) < included_len:
-                break
-            
-            packet_num += 1
-            
-            if len(pkt_data) > 0:
-                hci_type = pkt_data[0]
-                if hci_type not in packet_types:
-                    packet_types[hci_type] = []
-                packet_types[hci_type].append({
-                    'num': packet_num,
-                    'flags': flags,
-                    'data': pkt_data
-                })
-                
-                # Save ACL packets for detailed analysis
-                if hci_type == 0x02:
-                    acl_packets.append({
-                        'num': packet_num,
-                        'flags': flags,
-                        'data': pkt_data
-                    })
+        # Map the file rather than doing two read() calls per packet
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    with mm:
+        # Classification runs over the whole log in scan_records; only the
+        # ATT packets that get printed are sliced back out of the mapping
+        offsets, lengths, flags, hci_types, cids, att_opcodes, att_handles, att_first_bytes = \
+            scan_records(mm)
+        packet_num = len(offsets)
         
         print(f"=" * 80)
         print(f"PACKET TYPE SUMMARY")
@@ -73,27 +160,17 @@ def parse_btsnoop_all(filename):
             0x04: "HCI Event"
         }
         
-        for pkt_type, packets in sorted(packet_types.items()):
+        for pkt_type, count in count_values(hci_types):
             name = type_names.get(pkt_type, f"Unknown (0x{pkt_type:02X})")
-            print(f"  {name}: {len(packets)} packets")
+            print(f"  {name}: {count} packets")
         
         # Analyze ACL packets more deeply
-        if acl_packets:
+        acl_count = int(np.count_nonzero(hci_types == 0x02))
+        if acl_count:
             print(f"\n" + "=" * 80)
-            print(f"ACL PACKET ANALYSIS ({len(acl_packets)} packets)")
+            print(f"ACL PACKET ANALYSIS ({acl_count} packets)")
             print(f"=" * 80)
             
-            l2cap_cids = {}
-            
-            for pkt in acl_packets:
-                data = pkt['data']
-                if len(data) >= 9:
-                    # ACL: type(1) + handle(2) + len(2) + L2CAP: len(2) + CID(2)
-                    l2cap_cid = struct.unpack('<H', data[7:9])[0]
-                    if l2cap_cid not in l2cap_cids:
-                        l2cap_cids[l2cap_cid] = []
-                    l2cap_cids[l2cap_cid].append(pkt)
-            
             cid_names = {
                 0x0001: "L2CAP Signaling",
                 0x0004: "ATT (Attribute Protocol)",
@@ -101,34 +178,19 @@ def parse_btsnoop_all(filename):
                 0x0006: "SMP (Security Manager)"
             }
             
+            # ACL: type(1) + handle(2) + len(2) + L2CAP: len(2) + CID(2)
             print("\nL2CAP Channel IDs found:")
-            for cid, packets in sorted(l2cap_cids.items()):
+            for cid, count in count_values(cids):
                 name = cid_names.get(cid, f"Dynamic CID")
-                print(f"  CID 0x{cid:04X} ({name}): {len(packets)} packets")
+                print(f"  CID 0x{cid:04X} ({name}): {count} packets")
             
             # Focus on ATT (CID 0x0004)
-            att_packets = l2cap_cids.get(0x0004, [])
-            if att_packets:
+            att_count = int(np.count_nonzero(cids == 0x0004))
+            if att_count:
                 print(f"\n" + "=" * 80)
-                print(f"ATT PACKET DETAILS ({len(att_packets)} packets)")
+                print(f"ATT PACKET DETAILS ({att_count} packets)")
                 print(f"=" * 80)
                 
-                att_opcodes = {}
-                
-                for pkt in att_packets:
-                    data = pkt['data']
-                    if len(data) > 9:
-                        att_data = data[9:]
-                        if len(att_data) > 0:
-                            opcode = att_data[0]
-                            if opcode not in att_opcodes:
-                                att_opcodes[opcode] = []
-                            att_opcodes[opcode].append({
-                                'num': pkt['num'],
-                                'flags': pkt['flags'],
-                                'att_data': att_data
-                            })
-                
                 opcode_names = {
                     0x01: "Error Response",
                     0x02: "Exchange MTU Request",
@@ -158,87 +220,76 @@ def parse_btsnoop_all(filename):
                 }
                 
                 print("\nATT Opcodes found:")
-                for opcode, packets in sorted(att_opcodes.items()):
+                for opcode, count in count_values(att_opcodes):
                     name = opcode_names.get(opcode, "Unknown")
-                    print(f"  0x{opcode:02X} ({name}): {len(packets)} packets")
+                    print(f"  0x{opcode:02X} ({name}): {count} packets")
                 
                 # Show Write Commands (0x52) - these are the print data!
-                write_cmds = att_opcodes.get(0x52, [])
-                if write_cmds:
+                is_write_cmd = att_opcodes == 0x52
+                if is_write_cmd.any():
                     print(f"\n" + "-" * 80)
                     print(f"WRITE COMMAND PACKETS (0x52) - PRINTER DATA!")
                     print(f"-" * 80)
                     
-                    # Group by handle
-                    handles = {}
-                    for w in write_cmds:
-                        att_data = w['att_data']
-                        if len(att_data) >= 3:
-                            handle = struct.unpack('<H', att_data[1:3])[0]
-                            if handle not in handles:
-                                handles[handle] = []
-                            handles[handle].append({
-                                'num': w['num'],
-                                'flags': w['flags'],
-                                'data': att_data[3:]
-                            })
+                    # Group by handle: the handle column already holds every
+                    # write's handle, so each group is one mask over it and
+                    # only the printed writes are sliced out of the mapping
+                    write_idx = np.flatnonzero(is_write_cmd & (att_handles >= 0))
+                    write_handles = att_handles[write_idx]
                     
-                    for handle, writes in sorted(handles.items()):
+                    for handle in np.unique(write_handles).tolist():
+                        writes = write_idx[write_handles == handle]
                         print(f"\n=== Handle 0x{handle:04X} ({len(writes)} writes) ===")
                         
-                        for i, w in enumerate(writes[:30]):
-                            direction = "TX" if (w['flags'] & 0x01) == 0 else "RX"
-                            hex_data = ' '.join(f'{b:02X}' for b in w['data'][:40])
-                            more = "..." if len(w['data']) > 40 else ""
-                            print(f"  [{w['num']:5d}] {direction}: {hex_data}{more} ({len(w['data'])} bytes)")
+                        for i in writes[:30].tolist():
+                            data = mm[offsets[i] + 12:offsets[i] + lengths[i]]
+                            direction = "TX" if (flags[i] & 0x01) == 0 else "RX"
+                            hex_data = data[:40].hex(' ').upper()
+                            more = "..." if len(data) > 40 else ""
+                            print(f"  [{i + 1:5d}] {direction}: {hex_data}{more} ({len(data)} bytes)")
                         
                         if len(writes) > 30:
                             print(f"  ... and {len(writes) - 30} more writes")
                         
                         # Analyze first few bytes pattern
                         print(f"\n  First byte distribution:")
-                        first_bytes = {}
-                        for w in writes:
-                            if len(w['data']) > 0:
-                                fb = w['data'][0]
-                                if fb not in first_bytes:
-                                    first_bytes[fb] = 0
-                                first_bytes[fb] += 1
+                        values = att_first_bytes[writes]
+                        first_bytes = Counter(values[values >= 0].tolist())
                         
-                        for byte, count in sorted(first_bytes.items(), key=lambda x: -x[1])[:5]:
+                        for byte, count in first_bytes.most_common(5):
                             print(f"    0x{byte:02X}: {count} times")
                 
                 # Show Write Requests (0x12)
-                write_reqs = att_opcodes.get(0x12, [])
-                if write_reqs:
+                # Packets are indexes into the scanned columns; only the
+                # printed ones have their value sliced out of the mapping
+                write_reqs = np.flatnonzero(att_opcodes == 0x12)
+                if len(write_reqs):
                     print(f"\n" + "-" * 80)
                     print(f"WRITE REQUEST PACKETS (0x12)")
                     print(f"-" * 80)
                     
-                    for w in write_reqs[:20]:
-                        att_data = w['att_data']
-                        if len(att_data) >= 3:
-                            handle = struct.unpack('<H', att_data[1:3])[0]
-                            data = att_data[3:]
-                            direction = "TX" if (w['flags'] & 0x01) == 0 else "RX"
-                            hex_data = ' '.join(f'{b:02X}' for b in data)
-                            print(f"  [{w['num']:5d}] {direction} Handle 0x{handle:04X}: {hex_data}")
+                    for i in write_reqs[:20].tolist():
+                        handle = int(att_handles[i])
+                        if handle >= 0:
+                            data = mm[offsets[i] + 12:offsets[i] + lengths[i]]
+                            direction = "TX" if (flags[i] & 0x01) == 0 else "RX"
+                            hex_data = data.hex(' ').upper()
+                            print(f"  [{i + 1:5d}] {direction} Handle 0x{handle:04X}: {hex_data}")
                 
                 # Show Notifications (0x1B) - printer responses
-                notifications = att_opcodes.get(0x1B, [])
-                if notifications:
+                notifications = np.flatnonzero(att_opcodes == 0x1B)
+                if len(notifications):
                     print(f"\n" + "-" * 80)
                     print(f"NOTIFICATION PACKETS (0x1B) - PRINTER RESPONSES!")
                     print(f"-" * 80)
                     
-                    for n in notifications[:30]:
-                        att_data = n['att_data']
-                        if len(att_data) >= 3:
-                            handle = struct.unpack('<H', att_data[1:3])[0]
-                            data = att_data[3:]
-                            direction = "TX" if (n['flags'] & 0x01) == 0 else "RX"
-                            hex_data = ' '.join(f'{b:02X}' for b in data)
-                            print(f"  [{n['num']:5d}] {direction} Handle 0x{handle:04X}: {hex_data}")
+                    for i in notifications[:30].tolist():
+                        handle = int(att_handles[i])
+                        if handle >= 0:
+                            data = mm[offsets[i] + 12:offsets[i] + lengths[i]]
+                            direction = "TX" if (flags[i] & 0x01) == 0 else "RX"
+                            hex_data = data.hex(' ').upper()
+                            print(f"  [{i + 1:5d}] {direction} Handle 0x{handle:04X}: {hex_data}")
                     
                     if len(notifications) > 30:
                         print(f"  ... and {len(notifications) - 30} more")
@@ -248,4 +299,10 @@ if __name__ == '__main__':
         print(f"Usage: {sys.argv[0]} <btsnoop.log>")
         sys.exit(1)
     
-    parse_btsnoop_all(sys.argv[1])
+    # The report is many short lines: collect it and write it out in one go
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            parse_btsnoop_all(sys.argv[1])
+    finally:
+        sys.stdout.write(out.getvalue())
@@ -2,10 +2,19 @@
 """
 Analyze HCI Commands and Events in btsnoop - look for BLE connection info.
 """
+import contextlib
+import io
+import mmap
+from array import array
 import struct
 import sys
+from collections import Counter, defaultdict
 
 BTSNOOP_HEADER = b'btsnoop\x00'
+BTSNOOP_HEADER_LEN = 16
+# Per-packet record header: original/included length, flags, drops, timestamp
+PKT_HEADER = struct.Struct('>IIIIII')
+U16 = struct.Struct('<H')
 
 def parse_hci_details(filename):
     """Parse btsnoop file and show HCI command/event details."""
@@ -17,54 +26,56 @@ def parse_hci_details(filename):
             print(f"Invalid btsnoop header")
             return
         
-        # Skip version/datalink
-        f.read(8)
+        # Map the file rather than doing two read() calls per packet;
+        # version/datalink are skipped
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    with mm:
+        off = BTSNOOP_HEADER_LEN
+        end = len(mm)
         
         packet_num = 0
-        hci_commands = []
-        hci_events = []
+        # Only the opcode/event code is kept per packet; LE meta events also
+        # keep their params, for the subevent details
+        cmd_opcodes = array('H')
+        event_codes = bytearray()
+        le_meta_events = []
         
-        while True:
-            pkt_header = f.read(24)
-            if len(pkt_header) < 24:
-                break
-            
+        while off + PKT_HEADER.size <= end:
             original_len, included_len, flags, drops, timestamp_hi, timestamp_lo = \
-                struct.unpack('>IIIIII', pkt_header)
+                PKT_HEADER.unpack_from(mm, off)
+            off += PKT_HEADER.size
             
-            pkt_data = f.read(included_len)
-            if len(pkt_data) < included_len:
+            if off + included_len > end:
                 break
+            # Bodies are not copied: the few header bytes used are read from
+            # the mapping, and only LE meta event params are sliced out
+            pkt_off = off
+            pkt_end = off + included_len
+            off = pkt_end
             
             packet_num += 1
             
-            if len(pkt_data) > 0:
-                hci_type = pkt_data[0]
+            if included_len > 0:
+                hci_type = mm[pkt_off]
                 
-                if hci_type == 0x01 and len(pkt_data) >= 4:  # HCI Command
-                    opcode = struct.unpack('<H', pkt_data[1:3])[0]
-                    param_len = pkt_data[3]
-                    params = pkt_data[4:4+param_len] if len(pkt_data) > 4 else b''
-                    hci_commands.append({
-                        'num': packet_num,
-                        'opcode': opcode,
-                        'ogf': (opcode >> 10) & 0x3F,
-                        'ocf': opcode & 0x3FF,
-                        'params': params
-                    })
+                if hci_type == 0x01 and included_len >= 4:  # HCI Command
+                    # Little endian opcode, read inline: this runs once per command
+                    cmd_opcodes.append(mm[pkt_off + 1] | (mm[pkt_off + 2] << 8))
                 
-                elif hci_type == 0x04 and len(pkt_data) >= 3:  # HCI Event
-                    event_code = pkt_data[1]
-                    param_len = pkt_data[2]
-                    params = pkt_data[3:3+param_len] if len(pkt_data) > 3 else b''
-                    hci_events.append({
-                        'num': packet_num,
-                        'event': event_code,
-                        'params': params
-                    })
+                elif hci_type == 0x04 and included_len >= 3:  # HCI Event
+                    event_code = mm[pkt_off + 1]
+                    event_codes.append(event_code)
+                    if event_code == 0x3E:
+                        param_len = mm[pkt_off + 2]
+                        params = mm[pkt_off + 3:min(pkt_off + 3 + param_len, pkt_end)]
+                        le_meta_events.append({
+                            'num': packet_num,
+                            'params': params
+                        })
         
         print(f"=" * 80)
-        print(f"HCI COMMAND ANALYSIS ({len(hci_commands)} commands)")
+        print(f"HCI COMMAND ANALYSIS ({len(cmd_opcodes)} commands)")
         print(f"=" * 80)
         
         # Categorize commands by OGF
@@ -78,20 +89,15 @@ def parse_hci_details(filename):
         }
         
         # Count commands by OGF
-        ogf_counts = {}
-        for cmd in hci_commands:
-            ogf = cmd['ogf']
-            if ogf not in ogf_counts:
-                ogf_counts[ogf] = []
-            ogf_counts[ogf].append(cmd)
+        ogf_counts = Counter((opcode >> 10) & 0x3F for opcode in cmd_opcodes)
         
-        for ogf, cmds in sorted(ogf_counts.items()):
+        for ogf, count in sorted(ogf_counts.items()):
             name = ogf_names.get(ogf, "Unknown")
-            print(f"\nOGF 0x{ogf:02X} ({name}): {len(cmds)} commands")
+            print(f"\nOGF 0x{ogf:02X} ({name}): {count} commands")
         
         # Focus on LE commands (OGF 0x08)
-        le_commands = ogf_counts.get(0x08, [])
-        if le_commands:
+        le_ocfs = [opcode & 0x3FF for opcode in cmd_opcodes if (opcode >> 10) & 0x3F == 0x08]
+        if le_ocfs:
             print(f"\n" + "-" * 80)
             print(f"LE CONTROLLER COMMANDS (OGF 0x08)")
             print(f"-" * 80)
@@ -120,19 +126,14 @@ def parse_hci_details(filename):
                 0x0032: "LE Set PHY"
             }
             
-            ocf_counts = {}
-            for cmd in le_commands:
-                ocf = cmd['ocf']
-                if ocf not in ocf_counts:
-                    ocf_counts[ocf] = []
-                ocf_counts[ocf].append(cmd)
+            ocf_counts = Counter(le_ocfs)
             
-            for ocf, cmds in sorted(ocf_counts.items()):
+            for ocf, count in sorted(ocf_counts.items()):
                 name = le_ocf_names.get(ocf, "Unknown")
-                print(f"  OCF 0x{ocf:04X} ({name}): {len(cmds)}")
+                print(f"  OCF 0x{ocf:04X} ({name}): {count}")
         
         print(f"\n" + "=" * 80)
-        print(f"HCI EVENT ANALYSIS ({len(hci_events)} events)")
+        print(f"HCI EVENT ANALYSIS ({len(event_codes)} events)")
         print(f"=" * 80)
         
         event_names = {
@@ -147,19 +148,13 @@ def parse_hci_details(filename):
             0x3E: "LE Meta Event"
         }
         
-        event_counts = {}
-        for evt in hci_events:
-            code = evt['event']
-            if code not in event_counts:
-                event_counts[code] = []
-            event_counts[code].append(evt)
+        event_counts = Counter(event_codes)
         
-        for code, evts in sorted(event_counts.items()):
+        for code, count in sorted(event_counts.items()):
             name = event_names.get(code, "Unknown")
-            print(f"  Event 0x{code:02X} ({name}): {len(evts)}")
+            print(f"  Event 0x{code:02X} ({name}): {count}")
         
         # Analyze LE Meta Events (0x3E) - this is where BLE advertising/scan results live
-        le_meta_events = event_counts.get(0x3E, [])
         if le_meta_events:
             print(f"\n" + "-" * 80)
             print(f"LE META EVENTS (0x3E) - BLE Details")
@@ -180,13 +175,10 @@ def parse_hci_details(filename):
                 0x12: "LE PHY Update Complete"
             }
             
-            subevent_counts = {}
+            subevent_counts = defaultdict(list)
             for evt in le_meta_events:
                 if len(evt['params']) > 0:
-                    subevent = evt['params'][0]
-                    if subevent not in subevent_counts:
-                        subevent_counts[subevent] = []
-                    subevent_counts[subevent].append(evt)
+                    subevent_counts[evt['params'][0]].append(evt)
             
             for subevent, evts in sorted(subevent_counts.items()):
                 name = le_subevent_names.get(subevent, "Unknown")
@@ -198,7 +190,9 @@ def parse_hci_details(filename):
                 print(f"\n  --- Advertising Reports (Device Discovery) ---")
                 
                 # Extract device addresses from advertising reports
-                seen_devices = {}
+                # Sightings per address, and the address type first seen
+                seen_devices = Counter()
+                device_types = {}
                 for evt in adv_reports:
                     params = evt['params']
                     if len(params) >= 8:
@@ -209,16 +203,15 @@ def parse_hci_details(filename):
                             if len(params) >= offset + 8:
                                 addr_type = params[offset + 1]
                                 addr = params[offset + 2:offset + 8]
-                                addr_str = ':'.join(f'{b:02X}' for b in reversed(addr))
+                                addr_str = addr[::-1].hex(':').upper()  # little endian on air
                                 
-                                if addr_str not in seen_devices:
-                                    seen_devices[addr_str] = {'type': addr_type, 'count': 0}
-                                seen_devices[addr_str]['count'] += 1
+                                device_types.setdefault(addr_str, addr_type)
+                                seen_devices[addr_str] += 1
                 
                 print(f"\n  Discovered {len(seen_devices)} unique BLE devices:")
-                for addr, info in list(seen_devices.items())[:20]:
-                    addr_type = "Public" if info['type'] == 0 else "Random"
-                    print(f"    {addr} ({addr_type}) - seen {info['count']} times")
+                for addr, count in list(seen_devices.items())[:20]:
+                    addr_type = "Public" if device_types[addr] == 0 else "Random"
+                    print(f"    {addr} ({addr_type}) - seen {count} times")
             
             # Look for connection complete events
             conn_events = subevent_counts.get(0x01, []) + subevent_counts.get(0x0A, [])
@@ -229,11 +222,11 @@ def parse_hci_details(filename):
                     if len(params) >= 12:
                         # Subevent(1), Status(1), Handle(2), Role(1), Addr Type(1), Addr(6)
                         status = params[1]
-                        handle = struct.unpack('<H', params[2:4])[0]
+                        handle = U16.unpack_from(params, 2)[0]
                         role = "Central" if params[4] == 0 else "Peripheral"
                         addr_type = params[5]
                         addr = params[6:12]
-                        addr_str = ':'.join(f'{b:02X}' for b in reversed(addr))
+                        addr_str = addr[::-1].hex(':').upper()
                         
                         status_str = "OK" if status == 0 else f"Error 0x{status:02X}"
                         print(f"    [{evt['num']}] Handle 0x{handle:04X}, {role}, {addr_str} - {status_str}")
@@ -242,7 +235,7 @@ def parse_hci_details(filename):
         print(f"CONCLUSION")
         print(f"=" * 80)
         print(f"""
-This btsnoop log contains {len(hci_commands)} HCI commands and {len(hci_events)} HCI events,
+This btsnoop log contains {len(cmd_opcodes)} HCI commands and {len(event_codes)} HCI events,
 but NO ACL data packets (which would contain the actual BLE ATT data).
 
 This means the log captured connection setup but NOT the actual print data transfer.
@@ -264,4 +257,10 @@ if __name__ == '__main__':
         print(f"Usage: {sys.argv[0]} <btsnoop.log>")
         sys.exit(1)
     
-    parse_hci_details(sys.argv[1])
+    # The report is many short lines: collect it and write it out in one go
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            parse_hci_details(sys.argv[1])
+    finally:
+        sys.stdout.write(out.getvalue())
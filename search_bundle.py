@@ -1,5 +1,91 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 16-bit BLE UUIDs in full format (0000XXXX-0000-1000-8000) and short
+# ffeX/fffX UUIDs in quotes
+UUID_RE = re.compile(rb'0000[0-9a-fA-F]{4}-0000-1000-8000')
+SHORT_UUID_RE = re.compile(rb'["\'][fF]{2}[eEfF][0-9a-fA-F]["\']')
+
+# Look for patterns like [90, or new Uint8Array([90. Kept as separate regexes
+# rather than one alternation: matches overlap ("[90, 2," hits the first and
+# third) and each pattern reports its own count.
+CMD_PATTERNS = [
+    re.compile(rb'\[90\s*,\s*\d+'),  # [90, X
+    re.compile(rb'\[0x5[aA]\s*,'),   # [0x5a, or [0x5A,
+    re.compile(rb'90\s*,\s*2\s*,'),  # 90, 2,  (5A 02)
+    re.compile(rb'90\s*,\s*11\s*,'), # 90, 11, (5A 0B)
+]
+
+# Bundles larger than this are scanned in slices of this size, in parallel
+SCAN_CHUNK_SIZE = 8 << 20
+
+# Byte -> printable ASCII lookup tables for bytes.translate(): anything that
+# is not printable becomes '.', and INLINE_TABLE also flattens \t\n\r.
+PRINT_TABLE = bytes(b if 32 <= b < 127 or b in (9, 10, 13) else ord('.') for b in range(256))
+INLINE_TABLE = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+def sanitize(context, table=PRINT_TABLE):
+    """Render a bytes context as printable ASCII"""
+    return context.translate(table).decode('ascii')
+
+def find_all_matches(content, patterns):
+    """
+    Map each pattern name to the offsets of all its (possibly overlapping)
+    matches. With pyahocorasick this is a single pass over content for every
+    pattern at once; latin-1 maps bytes 1:1, so offsets are unchanged.
+    """
+    matches = {}
+    if ahocorasick is None:
+        # No pyahocorasick: one find() pass per pattern
+        for name, pattern in patterns.items():
+            idx = content.find(pattern)
+            while idx != -1:
+                matches.setdefault(name, []).append(idx)
+                idx = content.find(pattern, idx + 1)
+        return matches
+
+    automaton = ahocorasick.Automaton()
+    for name, pattern in patterns.items():
+        automaton.add_word(pattern.decode('latin-1'), (name, pattern))
+    automaton.make_automaton()
+    for end_idx, (name, pattern) in automaton.iter(content.decode('latin-1')):
+        matches.setdefault(name, []).append(end_idx - len(pattern) + 1)
+    return matches
+
+def scan_slice(filepath, start, patterns):
+    """
+    find_all_matches over one SCAN_CHUNK_SIZE slice of the file, keeping the
+    matches that start inside it. The slice is read with the longest pattern
+    minus one byte of overlap, so matches that straddle the boundary are
+    found here and not again by the next slice.
+    """
+    overlap = max(len(pattern) for pattern in patterns.values()) - 1
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        window = f.read(SCAN_CHUNK_SIZE + overlap)
+    return {
+        name: [start + idx for idx in offsets if idx < SCAN_CHUNK_SIZE]
+        for name, offsets in find_all_matches(window, patterns).items()
+    }
+
+def find_all_matches_parallel(filepath, size, patterns):
+    """find_all_matches for a whole file, one slice per worker process"""
+    starts = range(0, size, SCAN_CHUNK_SIZE)
+    matches = {}
+    with ProcessPoolExecutor() as executor:
+        # Slices come back in file order, so each name's offsets stay sorted
+        for partial in executor.map(scan_slice, repeat(filepath), starts, repeat(patterns)):
+            for name, offsets in partial.items():
+                if offsets:
+                    matches.setdefault(name, []).extend(offsets)
+    return matches
 
 def search_bundle(filepath):
     """Search the React Native bundle for BLE and printer patterns"""
@@ -74,30 +160,22 @@ def search_bundle(filepath):
     print(f"Searching {filepath}...")
     print(f"File size: {len(content)} bytes\n")
     
+    # Every pattern is located up front; reporting keeps the patterns order.
+    # Slices of a large bundle are independent, so they go to a process pool
+    if len(content) > SCAN_CHUNK_SIZE:
+        all_matches = find_all_matches_parallel(filepath, len(content), patterns)
+    else:
+        all_matches = find_all_matches(content, patterns)
     for name, pattern in patterns.items():
-        matches = []
-        idx = 0
-        while True:
-            idx = content.find(pattern, idx)
-            if idx == -1:
-                break
-            matches.append(idx)
-            idx += 1
-        
+        matches = all_matches.get(name)
         if matches:
             print(f"[FOUND] '{name}': {len(matches)} occurrence(s)")
             # Show context for first few matches
             for i, match_idx in enumerate(matches[:3]):
                 start = max(0, match_idx - 60)
                 end = min(len(content), match_idx + len(pattern) + 100)
-                context = content[start:end]
-                try:
-                    context_str = context.decode('utf-8', errors='replace')
-                    # Clean non-printable
-                    context_str = ''.join(c if c.isprintable() or c in '\n\r\t' else '.' for c in context_str)
-                    print(f"  [{i+1}] ...{context_str}...")
-                except:
-                    pass
+                context_str = sanitize(content[start:end])
+                print(f"  [{i+1}] ...{context_str}...")
             print()
 
     # Special search: find any 4-digit hex patterns that look like BLE UUIDs
@@ -106,16 +184,14 @@ def search_bundle(filepath):
     print("="*80)
     
     # Pattern for 16-bit UUID in full format: 0000XXXX-0000-1000-8000
-    uuid_pattern = rb'0000[0-9a-fA-F]{4}-0000-1000-8000'
-    uuid_matches = re.findall(uuid_pattern, content)
+    uuid_matches = UUID_RE.findall(content)
     if uuid_matches:
         print(f"Found {len(uuid_matches)} potential BLE UUIDs:")
         for uuid in set(uuid_matches):
             print(f"  {uuid.decode()}")
     
     # Also search for short UUIDs in quotes
-    short_uuid_pattern = rb'["\'][fF]{2}[eEfF][0-9a-fA-F]["\']'
-    short_matches = re.findall(short_uuid_pattern, content)
+    short_matches = SHORT_UUID_RE.findall(content)
     if short_matches:
         print(f"\nFound {len(short_matches)} potential short UUIDs:")
         for uuid in set(short_matches):
@@ -126,23 +202,14 @@ def search_bundle(filepath):
     print("SEARCHING FOR COMMAND PACKET PATTERNS")
     print("="*80)
     
-    # Look for patterns like [90, or new Uint8Array([90
-    cmd_patterns = [
-        rb'\[90\s*,\s*\d+',  # [90, X
-        rb'\[0x5[aA]\s*,',   # [0x5a, or [0x5A,
-        rb'90\s*,\s*2\s*,',  # 90, 2,  (5A 02)
-        rb'90\s*,\s*11\s*,', # 90, 11, (5A 0B)
-    ]
-    
-    for pat in cmd_patterns:
-        matches = list(re.finditer(pat, content))
+    for pat in CMD_PATTERNS:
+        matches = list(pat.finditer(content))
         if matches:
-            print(f"\nPattern {pat.decode()}: {len(matches)} matches")
+            print(f"\nPattern {pat.pattern.decode()}: {len(matches)} matches")
             for m in matches[:5]:
                 start = max(0, m.start() - 50)
                 end = min(len(content), m.end() + 100)
-                context = content[start:end].decode('utf-8', errors='replace')
-                context = ''.join(c if c.isprintable() else '.' for c in context)
+                context = sanitize(content[start:end], INLINE_TABLE)
                 print(f"  ...{context}...")
 
 if __name__ == "__main__":
@@ -1,12 +1,404 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import mmap
 import os
+import pickle
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
 
-def main():
-    filepath = r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk\assets\index.android.bundle"
+import numpy as np
+
+# Numba is optional: with it the raw command byte scan runs as native code,
+# without it NumPy does the same scan in a few whole-array steps.
+try:
+    from numba import njit, types
+except ImportError:
+    njit = None
+
+try:
+    # Hyperscan: every regex checked in one streaming pass over the bundle
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Regexes are compiled once here rather than on every finditer() call
+
+# Bundles larger than this have their regex scans spread over a process pool
+PARALLEL_MIN_SIZE = 8 << 20
+
+# Bytes fed to each hyperscan stream.scan() call
+HS_CHUNK_SIZE = 8 << 20
+
+# Scan results are cached here per bundle mtime/size, see load_scans().
+# Bump CACHE_FORMAT whenever the saved results or the way they are produced
+# change; entries from before version 2 may come from the dropped ripgrep path.
+CACHE_DIR = Path(__file__).resolve().parent / ".searchcache"
+CACHE_FORMAT = 2
+
+# Raw 5A <cmd> byte pairs. A JS text bundle spells these in decimal (see
+# below), but a Hermes bytecode bundle can hold them as bytes.
+CMD_PREFIX = 0x5A
+CMD_IDS = (0x02, 0x0B, 0x04, 0x06, 0x07)
+# How many raw command offsets get a hex dump
+RAW_CMD_SHOWN = 10
+
+CMD_IS_ID = np.zeros(256, dtype=np.bool_)
+CMD_IS_ID[list(CMD_IDS)] = True
+
+if njit is not None:
+    # Explicit signature: compiled (or loaded from cache) at import rather
+    # than on the first call. buf is a read-only view of the mmap.
+    @njit(types.int64(types.Array(types.uint8, 1, 'C', readonly=True), types.boolean[::1],
+                      types.int64[::1], types.int64[::1]), cache=True)
+    def _find_raw_cmds_jit(buf, is_id, first, counts):
+        n = 0
+        for i in range(buf.size - 1):
+            if buf[i] == CMD_PREFIX and is_id[buf[i + 1]]:
+                if n < first.size:
+                    first[n] = i
+                counts[buf[i + 1]] += 1
+                n += 1
+        return n
+
+def find_raw_commands(content):
+    """
+    Returns (number of 5A <cmd> pairs, offsets of the first RAW_CMD_SHOWN,
+    {cmd id: count}) from one pass over content.
+    """
+    buf = np.frombuffer(content, dtype=np.uint8)
+    if njit is not None:
+        first = np.empty(RAW_CMD_SHOWN, dtype=np.int64)
+        counts = np.zeros(256, dtype=np.int64)
+        n = _find_raw_cmds_jit(buf, CMD_IS_ID, first, counts)
+        return n, first[:min(n, RAW_CMD_SHOWN)].tolist(), {c: int(counts[c]) for c in CMD_IDS}
+
+    # 0x5A positions (the last byte can't start a pair), then a table lookup
+    # on the byte after each keeps only the command IDs
+    cand = np.flatnonzero(buf[:-1] == CMD_PREFIX)
+    hits = cand[CMD_IS_ID[buf[cand + 1]]]
+    counts = np.bincount(buf[hits + 1], minlength=256)
+    return len(hits), hits[:RAW_CMD_SHOWN].tolist(), {c: int(counts[c]) for c in CMD_IDS}
+
+# Search for these patterns as decimal numbers in arrays. The last field is
+# a literal every match must contain: when find() can't see it the regex
+# pass is skipped. Only case-free literals (digits) qualify, since these
+# regexes are case-insensitive and find() is not.
+PATTERNS_TO_FIND = [(re.compile(pattern, re.IGNORECASE), name, required) for pattern, name, required in [
+    # Command IDs we've seen, as consecutive elements of a JS array literal
+    # (minifiers emit byte arrays in decimal). These used to be
+    # \b90\b.*?\b2\b.*?\b100\b, but a minified bundle is one huge line, so
+    # each lazy .*? could run to the end of the file for every '90': quadratic.
+    (rb'\b90\s*,\s*2\s*,\s*100\b', 'Decimal pattern 90, 2, 100 (5A 02 64)', b'100'),
+    (rb'\b90\s*,\s*11\s*,\s*11\b', 'Decimal pattern 90, 11, 11 (5A 0B 0B)', b'11'),
     
-    with open(filepath, 'rb') as f:
-        content = f.read()
+    # Look for "5A" in strings
+    (rb'["\']5[aA]', '5A in string', None),
+    (rb'5[aA]\s*0[02]', '5A0x pattern', None),
+    
+    # Look for characteristic service patterns
+    (rb'service.*?ffe', 'service...ffe pattern', None),
+    (rb'characteristic.*?ffe', 'characteristic...ffe pattern', None),
     
+    # Command constants
+    (rb'CMD_', 'CMD_ constants', None),
+    (rb'COMMAND_', 'COMMAND_ constants', None),
+    (rb'cmd[A-Z]', 'cmdX pattern', None),
+]]
+
+# Look for function definitions; all of them need the literal 'function'
+FUNC_PATTERNS = [re.compile(pattern) for pattern in [
+    rb'function\s+\w*[pP]rint\w*',
+    rb'function\s+\w*[sS]end\w*',
+    rb'function\s+\w*[wW]rite\w*Data',
+    rb'function\s+\w*[cC]rc\w*',
+    rb'function\s+\w*[cC]hecksum\w*',
+]]
+
+# Protocol words, each searched for near 'print', 'ble', 'write' or 'send'
+PROTOCOL_STRINGS = [
+    b'header',
+    b'payload',
+    b'packet',
+    b'frame',
+    b'magic',
+]
+PROTOCOL_KEYWORDS = [b'print', b'ble', b'write', b'send']
+PROTOCOL_REACH = 50
+
+class NearKeyword:
+    """
+    Same matches as re.compile(rb'(?:print|ble|write|send).{0,50}' + word,
+    re.IGNORECASE).finditer(), without running that regex over the whole
+    bundle: word itself is found first, and the full regex is only tried in
+    the window a match around that occurrence could span. Has the pattern
+    and flags attributes of the full regex.
+    """
+    def __init__(self, word):
+        self.word = word
+        self.rx = re.compile(rb'(?:' + b'|'.join(PROTOCOL_KEYWORDS) + rb').{0,%d}' % PROTOCOL_REACH + word,
+                             re.IGNORECASE)
+        self.pattern, self.flags = self.rx.pattern, self.rx.flags
+        # Lookahead so overlapping occurrences of word are all candidates
+        self.word_rx = re.compile(rb'(?=' + re.escape(word) + rb')', re.IGNORECASE)
+        # Furthest a match can start before its occurrence of word
+        self.before = max(map(len, PROTOCOL_KEYWORDS)) + PROTOCOL_REACH
+
+    def finditer(self, content):
+        # Every match starts within self.before bytes ahead of some
+        # occurrence of word, and one starting at or before occurrence w
+        # ends by w + before + len(word). Searching [w - before, that end)
+        # per occurrence therefore finds the same leftmost, greedy,
+        # non-overlapping matches as the full scan.
+        pos = 0
+        for occurrence in self.word_rx.finditer(content):
+            w = occurrence.start()
+            if w < pos:
+                continue
+            m = self.rx.search(content, max(pos, w - self.before), w + self.before + len(self.word))
+            # A match starting past w belongs to a later occurrence's window
+            if m and m.start() <= w:
+                yield m
+                pos = m.end()
+
+PROTOCOL_PATTERNS = [(word, NearKeyword(word)) for word in PROTOCOL_STRINGS]
+
+# Literal strings, only the first occurrence of each is shown
+ERROR_PATTERNS = [
+    b'crc error',
+    b'checksum error',
+    b'invalid crc',
+    b'crc failed',
+    b'bad crc',
+    b'crc mismatch',
+]
+
+# Look for base64 or hex encoding of data
+ENCODING_PATTERNS = [
+    b'base64ToUint8Array',
+    b'hexToBytes',
+    b'bytesToHex',
+    b'stringToBytes',
+    b'toByteArray',
+    b'fromByteArray',
+]
+
+# Byte -> printable ASCII lookup table for bytes.translate(): anything that
+# is not printable, \t\n\r included, becomes '.'
+PRINT_TABLE = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+def sanitize(context):
+    """Render a bytes context as one line of printable ASCII"""
+    return context.translate(PRINT_TABLE).decode('ascii')
+
+def context(content, start, end, before, after):
+    """content from before bytes ahead of start to after bytes past end, sanitized"""
+    return sanitize(content[max(0, start - before):min(len(content), end + after)])
+
+def print_hits(content, header, matches, count, before, after):
+    """'<header>: <count> matches', then each (start, end) match in context"""
+    if matches:
+        print(f"\n{header}: {count} matches")
+        for start, end in matches:
+            print(f"  ...{context(content, start, end, before, after)}...")
+
+def literal_alternation(literals):
+    """One regex matching any of the literals. The lookahead keeps matches
+    zero-width, so overlapping literals ('invalid crc error') all get seen."""
+    return re.compile(rb'(?=(' + b'|'.join(map(re.escape, literals)) + rb'))')
+
+CRYSTOOLS_RE = re.compile(rb'crystools')
+ERROR_RE = literal_alternation(ERROR_PATTERNS)
+ENCODING_RE = literal_alternation(ENCODING_PATTERNS)
+
+def first_occurrences(content, rx, literals):
+    """{literal: offset of its first occurrence} from a single finditer pass"""
+    first = {}
+    for m in rx.finditer(content):
+        first.setdefault(m.group(1), m.start())
+        if len(first) == len(literals):
+            break
+    return first
+
+def first_matches(content, rx, required, limit, count_all):
+    """
+    Returns ((start, end) of the first limit matches, count label). Nothing
+    is scanned if the literal required isn't in content. Unless count_all is
+    set the regex stops one match past limit and the label reads e.g. '3+';
+    with it, the rest are counted without being kept.
+    """
+    if required and content.find(required) == -1:
+        return [], '0'
+    it = rx.finditer(content)
+    head = [m.span() for m in itertools.islice(it, limit + 1)]
+    if len(head) <= limit:
+        return head, str(len(head))
+    if count_all:
+        return head[:limit], str(len(head) + sum(1 for _ in it))
+    return head[:limit], f"{limit}+"
+
+def map_bundle(filepath):
+    """
+    Map the bundle read-only instead of reading it into memory; find(),
+    slicing and re.finditer() all work on the mmap directly. Where the OS
+    supports it the kernel is told the whole file is wanted, read in order,
+    so a cold run reads ahead rather than faulting pages in one at a time.
+    Windows has neither call and just maps the file.
+    """
+    with open(filepath, 'rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_WILLNEED'):
+        content.madvise(mmap.MADV_WILLNEED)
+    return content
+
+# Each pool worker maps the bundle once and runs whole regex scans on it:
+# re holds the GIL, so the scans need processes rather than threads to overlap
+_worker_content = None
+
+def _open_worker_bundle(filepath):
+    global _worker_content
+    _worker_content = map_bundle(filepath)
+
+def _first_matches_worker(rx, required, limit, count_all):
+    return first_matches(_worker_content, rx, required, limit, count_all)
+
+def matching_patterns(content, regexes):
+    """
+    Indices of the regexes with at least one match in content, from a single
+    hyperscan pass, or None without hyperscan. Hyperscan reports overlapping
+    matches, so it only decides which regexes re needs to run; the spans and
+    counts still come from re.
+    """
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_STREAM)
+    try:
+        db.compile(
+            expressions=[rx.pattern for rx in regexes],
+            ids=list(range(len(regexes))),
+            elements=len(regexes),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH
+                   | (hyperscan.HS_FLAG_CASELESS if rx.flags & re.IGNORECASE else 0)
+                   for rx in regexes],
+        )
+    except hyperscan.error:
+        return None
+
+    found = set()
+    def on_match(idx, start, end, flags, context):
+        found.add(idx)
+        # Stop early once every regex has matched
+        return len(found) == len(regexes)
+
+    # Streamed in slices so an mmap is never copied whole
+    try:
+        with db.stream(match_event_handler=on_match) as stream:
+            for start in range(0, len(content), HS_CHUNK_SIZE):
+                stream.scan(content[start:start + HS_CHUNK_SIZE])
+    except hyperscan.ScanTerminated:
+        pass
+    return found
+
+def run_scans(content, jobs, count_all, filepath=None):
+    """first_matches for each (rx, required, limit) job, in job order"""
+    results = [([], '0')] * len(jobs)
+    present = matching_patterns(content, [rx for rx, required, limit in jobs])
+    todo = [i for i in range(len(jobs)) if present is None or i in present]
+    if not todo:
+        return results
+
+    if filepath is None or len(content) <= PARALLEL_MIN_SIZE:
+        found = [first_matches(content, *jobs[i], count_all) for i in todo]
+    else:
+        with ProcessPoolExecutor(initializer=_open_worker_bundle, initargs=(filepath,)) as executor:
+            found = list(executor.map(_first_matches_worker, *zip(*(jobs[i] for i in todo)),
+                                      repeat(count_all)))
+    for i, result in zip(todo, found):
+        results[i] = result
+    return results
+
+# (rx, required literal, matches shown) for each regex scan, in print order
+PATTERN_JOBS = [(rx, required, 3) for rx, name, required in PATTERNS_TO_FIND]
+FUNC_JOBS = [(rx, None, 5) for rx in FUNC_PATTERNS]
+PROTOCOL_JOBS = [(combined, None, 3) for pattern, combined in PROTOCOL_PATTERNS]
+
+# Changes whenever any search does, so stale cache entries are never read
+PATTERNS_KEY = hashlib.blake2b(repr((
+    [(rx.pattern, rx.flags, required, limit)
+     for rx, required, limit in PATTERN_JOBS + FUNC_JOBS + PROTOCOL_JOBS],
+    CRYSTOOLS_RE.pattern, ERROR_PATTERNS, ENCODING_PATTERNS, CMD_PREFIX, CMD_IDS, RAW_CMD_SHOWN,
+)).encode(), digest_size=8).hexdigest()
+
+def scan_bundle(content, count_all, filepath=None):
+    """
+    Every search's raw results, without the contexts:
+    {'has_functions': bool, 'regex': [(spans, count label), ...],
+     'raw_cmds': (total, [offset, ...], {cmd id: count}), 'crystools': [offset, ...],
+     'errors': {literal: offset}, 'encodings': {literal: offset}}
+    """
+    has_functions = content.find(b'function') != -1
+    jobs = PATTERN_JOBS.copy()
+    # One find() above rules out all of FUNC_PATTERNS when there's no 'function'
+    if has_functions:
+        jobs += FUNC_JOBS
+    jobs += PROTOCOL_JOBS
+    return {
+        'has_functions': has_functions,
+        'regex': run_scans(content, jobs, count_all, filepath),
+        'raw_cmds': find_raw_commands(content),
+        # 'crystools' seems to be app-specific
+        'crystools': [m.start() for m in itertools.islice(CRYSTOOLS_RE.finditer(content), 10)],
+        'errors': first_occurrences(content, ERROR_RE, ERROR_PATTERNS),
+        'encodings': first_occurrences(content, ENCODING_RE, ENCODING_PATTERNS),
+    }
+
+def load_scans(content, count_all, filepath=None):
+    """
+    scan_bundle, reusing the results saved for filepath by an earlier run
+    when its mtime and size, the searches and the scan engine are unchanged.
+    """
+    if filepath is None:
+        return scan_bundle(content, count_all)
+    path = Path(filepath)
+    stat = path.stat()
+    mode = 'all' if count_all else 'head'
+    engine = 're' if hyperscan is None else 'hyperscan'
+    cache_file = (CACHE_DIR / f"{path.name}.{stat.st_mtime_ns}.{stat.st_size}.{PATTERNS_KEY}"
+                              f".{engine}.{mode}.v{CACHE_FORMAT}.pkl")
+    if cache_file.exists():
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    scans = scan_bundle(content, count_all, filepath)
+
+    # Written under a temporary name first, so an interrupted run can't
+    # leave a truncated entry behind
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_file = cache_file.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(scans, f, protocol=4)
+    os.replace(tmp_file, cache_file)
+    return scans
+
+def search_protocol(content, count_all=False, filepath=None):
+    """
+    Run every search phase over the bundle contents (bytes or mmap). Given
+    the bundle's filepath, a large bundle's regex scans run in parallel and
+    the results are cached for the next run.
+    """
+    # The searches are independent, so they all run up front; the phases
+    # below print their results in order
+    scans = load_scans(content, count_all, filepath)
+    results = iter(scans['regex'])
+
     print("="*80)
     print("SEARCHING FOR COMMAND BYTE PATTERNS IN DECIMAL")
     print("="*80)
@@ -18,158 +410,85 @@ def main():
     # 5A 06 = 90, 6
     # 5A 07 = 90, 7
     
-    # Search for these patterns as decimal numbers in arrays
-    patterns_to_find = [
-        # Command IDs we've seen
-        (rb'\b90\b.*?\b2\b.*?\b100\b', 'Decimal pattern 90, 2, 100 (5A 02 64)'),
-        (rb'\b90\b.*?\b11\b.*?\b11\b', 'Decimal pattern 90, 11, 11 (5A 0B 0B)'),
-        
-        # Look for "5A" in strings
-        (rb'["\']5[aA]', '5A in string'),
-        (rb'5[aA]\s*0[02]', '5A0x pattern'),
-        
-        # Look for characteristic service patterns
-        (rb'service.*?ffe', 'service...ffe pattern'),
-        (rb'characteristic.*?ffe', 'characteristic...ffe pattern'),
-        
-        # Command constants
-        (rb'CMD_', 'CMD_ constants'),
-        (rb'COMMAND_', 'COMMAND_ constants'),
-        (rb'cmd[A-Z]', 'cmdX pattern'),
-    ]
+    for rx, name, required in PATTERNS_TO_FIND:
+        print_hits(content, f"[{name}]", *next(results), 50, 100)
+
+    print("\n" + "="*80)
+    print("SEARCHING FOR RAW 5A COMMAND BYTES (Hermes bytecode)")
+    print("="*80)
     
-    for pattern, name in patterns_to_find:
-        matches = list(re.finditer(pattern, content, re.IGNORECASE))
-        if matches:
-            print(f"\n[{name}]: {len(matches)} matches")
-            for m in matches[:3]:
-                start = max(0, m.start() - 50)
-                end = min(len(content), m.end() + 100)
-                ctx = content[start:end].decode('utf-8', errors='replace')
-                ctx = ''.join(c if c.isprintable() else '.' for c in ctx)
-                print(f"  ...{ctx}...")
+    total, first, counts = scans['raw_cmds']
+    if total:
+        print(f"\n{total} occurrences: "
+              + ", ".join(f"5A {cmd:02X} x{n}" for cmd, n in counts.items() if n))
+        for off in first:
+            ctx = content[max(0, off-16):off+16]
+            print(f"  0x{off:08X}: {ctx.hex(' ').upper()}  |{sanitize(ctx)}|")
 
     print("\n" + "="*80)
     print("SEARCHING FOR 'crystools' CONTEXT (app-specific code)")
     print("="*80)
     
-    # 'crystools' seems to be app-specific
-    idx = 0
-    count = 0
-    while count < 10:
-        idx = content.find(b'crystools', idx)
-        if idx == -1:
-            break
-        ctx = content[max(0, idx-100):min(len(content), idx+300)]
-        try:
-            s = ctx.decode('utf-8', errors='replace')
-            s = ''.join(c if c.isprintable() else '.' for c in s)
-            print(f"\n--- crystools occurrence {count+1} ---")
-            print(s)
-        except:
-            pass
-        idx += 1
-        count += 1
+    for count, idx in enumerate(scans['crystools']):
+        print(f"\n--- crystools occurrence {count+1} ---")
+        print(context(content, idx, idx, 100, 300))
 
     print("\n" + "="*80)
     print("SEARCHING FOR FUNCTION NAMES WITH 'print' or 'send'")
     print("="*80)
     
-    # Look for function definitions
-    func_patterns = [
-        rb'function\s+\w*[pP]rint\w*',
-        rb'function\s+\w*[sS]end\w*',
-        rb'function\s+\w*[wW]rite\w*Data',
-        rb'function\s+\w*[cC]rc\w*',
-        rb'function\s+\w*[cC]hecksum\w*',
-    ]
-    
-    for pattern in func_patterns:
-        matches = list(re.finditer(pattern, content))
-        if matches:
-            print(f"\nPattern '{pattern.decode()}': {len(matches)} matches")
-            for m in matches[:5]:
-                start = max(0, m.start() - 30)
-                end = min(len(content), m.end() + 200)
-                ctx = content[start:end].decode('utf-8', errors='replace')
-                ctx = ''.join(c if c.isprintable() else '.' for c in ctx)
-                print(f"  ...{ctx}...")
+    for rx in FUNC_PATTERNS:
+        if not scans['has_functions']:
+            break
+        print_hits(content, f"Pattern '{rx.pattern.decode()}'", *next(results), 30, 200)
 
     print("\n" + "="*80)
     print("SEARCHING FOR ERROR MESSAGE PATTERNS")
     print("="*80)
     
-    error_patterns = [
-        b'crc error',
-        b'checksum error',
-        b'invalid crc',
-        b'crc failed',
-        b'bad crc',
-        b'crc mismatch',
-    ]
-    
-    for pattern in error_patterns:
-        idx = content.find(pattern)
+    first = scans['errors']
+    for pattern in ERROR_PATTERNS:
+        idx = first.get(pattern, -1)
         if idx != -1:
-            ctx = content[max(0, idx-200):min(len(content), idx+300)]
-            try:
-                s = ctx.decode('utf-8', errors='replace')
-                s = ''.join(c if c.isprintable() else '.' for c in s)
-                print(f"\n[{pattern.decode()}]:")
-                print(s)
-            except:
-                pass
+            print(f"\n[{pattern.decode()}]:")
+            print(context(content, idx, idx, 200, 300))
 
     print("\n" + "="*80)
     print("SEARCHING FOR DATA ENCODING PATTERNS")
     print("="*80)
     
-    # Look for base64 or hex encoding of data
-    encoding_patterns = [
-        rb'base64ToUint8Array',
-        rb'hexToBytes',
-        rb'bytesToHex',
-        rb'stringToBytes',
-        rb'toByteArray',
-        rb'fromByteArray',
-    ]
-    
-    for pattern in encoding_patterns:
-        idx = content.find(pattern)
+    first = scans['encodings']
+    for pattern in ENCODING_PATTERNS:
+        idx = first.get(pattern, -1)
         if idx != -1:
-            ctx = content[max(0, idx-100):min(len(content), idx+300)]
-            try:
-                s = ctx.decode('utf-8', errors='replace')
-                s = ''.join(c if c.isprintable() else '.' for c in s)
-                print(f"\n[{pattern.decode()}]:")
-                print(s)
-            except:
-                pass
+            print(f"\n[{pattern.decode()}]:")
+            print(context(content, idx, idx, 100, 300))
 
     print("\n" + "="*80)
     print("SEARCHING FOR PROTOCOL-RELATED STRINGS")
     print("="*80)
     
-    protocol_strings = [
-        b'header',
-        b'payload',
-        b'packet',
-        b'frame',
-        b'magic',
-    ]
+    for pattern, combined in PROTOCOL_PATTERNS:
+        print_hits(content, f"[{pattern.decode()} near print/ble/write/send]", *next(results), 30, 100)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", action="store_true",
+                        help="Report exact match counts (scans each pattern to the end)")
+    args = parser.parse_args()
+
+    filepath = r"c:\Users\maxgo\Downloads\Sentimo\funnyprint_apk\assets\index.android.bundle"
     
-    for pattern in protocol_strings:
-        # Find in context of 'print' or 'ble' or 'write'
-        combined = rb'(?:print|ble|write|send).{0,50}' + pattern
-        matches = list(re.finditer(combined, content, re.IGNORECASE))
-        if matches:
-            print(f"\n[{pattern.decode()} near print/ble/write/send]: {len(matches)} matches")
-            for m in matches[:3]:
-                start = max(0, m.start() - 30)
-                end = min(len(content), m.end() + 100)
-                ctx = content[start:end].decode('utf-8', errors='replace')
-                ctx = ''.join(c if c.isprintable() else '.' for c in ctx)
-                print(f"  ...{ctx}...")
+    content = map_bundle(filepath)
+    # The report is many short lines and every scan finishes before the
+    # first one: collect it and write it out in one go
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            search_protocol(content, count_all=args.count, filepath=filepath)
+    finally:
+        content.close()
+        sys.stdout.write(out.getvalue())
 
 if __name__ == "__main__":
     main()